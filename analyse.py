@@ -1,100 +1,114 @@
 from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from profiling import instrument
+from schedule import habit_schedule
+from storage import get_backend
+from timezones import calendar_for
 
+
+@instrument
 def get_longest_streak(db, habit_name):
     """
     Calculate the longest streak for a given habit, taking periodicity into account.
+    Check-ins are counted on the day they fall on in the user's timezone.
     """
-    cursor = db.cursor()
-    cursor.execute('''SELECT increment_date, periodicity FROM counters
-                      INNER JOIN habits ON counters.habit_id = habits.id
-                      WHERE habits.name = ?
-                      ORDER BY increment_date ASC''', (habit_name,))
-    rows = cursor.fetchall()
+    backend = get_backend(db)
+    rows = backend.history(habit_name)
 
     if not rows:
         return 0
 
     # Determine periodicity from the first row
-    periodicity = rows[0][1].lower()  # "daily" or "weekly"
-
-    # Extract unique dates (ignore time) as a sorted list of datetime.date objects
-    unique_days = sorted({datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S").date() for row in rows})
-
-    longest_streak = 0
-    current_streak = 1
-
-    # Define gap threshold based on periodicity
-    gap_threshold = 1 if periodicity == "daily" else 7
+    periodicity = rows[0][1]
 
-    for i in range(1, len(unique_days)):
-        if (unique_days[i] - unique_days[i - 1]).days <= gap_threshold:
-            current_streak += 1
-        else:
-            longest_streak = max(longest_streak, current_streak)
-            current_streak = 1
+    # Bucket the check-ins into sorted unique local days
+    calendar = calendar_for(backend.timezone())
+    unique_days = sorted(set(calendar.check_in_days((row[0], row[2]) for row in rows)))
 
-    # Final check for the last streak
-    longest_streak = max(longest_streak, current_streak)
-
-    # Convert weekly streak to days
-    if periodicity == "weekly":
-        longest_streak *= 7
-
-    return longest_streak
+    return habit_schedule(periodicity).streaks(unique_days)[0]
 
 
+@instrument
 def get_longest_streak_all_habits(db):
     """
     Calculate the longest streak across all habits, taking periodicity into account.
     """
-    cursor = db.cursor()
-    cursor.execute('''SELECT increment_date, periodicity FROM counters
-                      INNER JOIN habits ON counters.habit_id = habits.id
-                      ORDER BY increment_date ASC''')
-    rows = cursor.fetchall()
+    backend = get_backend(db)
+    rows = backend.history_all()
 
     if not rows:
         return 0
 
-    # Group increment dates by periodicity
-    daily_dates = sorted({
-        datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S").date()
-        for row in rows if row[1].lower() == "daily"
-    })
-    weekly_dates = sorted({
-        datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S").date()
-        for row in rows if row[1].lower() == "weekly"
-    })
-
-    # Helper function to calculate streaks
-    def calculate_streak(dates, is_daily):
-        if not dates:
-            return 0
-
-        longest_streak = 1
-        current_streak = 1
-        gap_threshold = 1 if is_daily else 7
-
-        for i in range(1, len(dates)):
-            if (dates[i] - dates[i - 1]).days <= gap_threshold:
-                current_streak += 1
-            else:
-                longest_streak = max(longest_streak, current_streak)
-                current_streak = 1
-
-        # Final check for the last streak
-        longest_streak = max(longest_streak, current_streak)
-
-        # Convert weekly streak to days for consistent scoring
-        if not is_daily:
-            longest_streak *= 7
-
-        return longest_streak
-
-    # Calculate longest streaks for daily and weekly habits
-    longest_daily_streak = calculate_streak(daily_dates, is_daily=True)
-    longest_weekly_streak = calculate_streak(weekly_dates, is_daily=False)
+    # Group local days by schedule
+    calendar = calendar_for(backend.timezone())
+    days_by_schedule = {}
+    for row, day in zip(rows, calendar.check_in_days((row[0], row[2]) for row in rows)):
+        days_by_schedule.setdefault(habit_schedule(row[1]), set()).add(day)
 
     # Return the overall longest streak in days
-    return max(longest_daily_streak, longest_weekly_streak)
+    return max(schedule.streaks(sorted(days))[0] for schedule, days in days_by_schedule.items())
+
 
+def _last_check_in(calendar, check_ins):
+    """
+    Return the local time of the latest of a list of (increment_date, increment_ts) check-ins
+    as a naive datetime, or None if the list is empty.
+    """
+    if not check_ins:
+        return None
+    return calendar.local_datetime(max(ts if ts is not None else calendar.parse(increment_date)
+                                       for increment_date, ts in check_ins))
+
+
+@instrument
+def get_dashboard(db, today=None):
+    """
+    Calculate the overview statistics of every habit in a single pass over the check-ins.
+
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
+    today : date, optional
+        The date the current streak and the completion rate are calculated for.
+        Defaults to today in the user's timezone.
+
+    Returns:
+    -------
+    List[dict]
+        One dictionary per habit, in creation order, with the keys name, periodicity, count,
+        current_streak, longest_streak, last_check_in (datetime or None) and completion_rate.
+    """
+    backend = get_backend(db)
+    calendar = calendar_for(backend.timezone())
+    today = (today or calendar.local_datetime(calendar.timestamp()).date()).toordinal()
+    dashboard = []
+    # Rows arrive ordered by habit, so each habit's check-ins are consumed as one group
+    for _, rows in groupby(backend.dashboard_rows(), key=itemgetter(0)):
+        rows = list(rows)
+        _, name, periodicity, creation_date, _, _ = rows[0]
+        schedule = habit_schedule(periodicity)
+        periodicity = periodicity.lower()
+        check_ins = [(row[4], row[5]) for row in rows if row[4] is not None]
+        unique_days = sorted(set(calendar.check_in_days(check_ins)))
+        longest_streak, current_streak = schedule.streaks(unique_days, today)
+
+        try:
+            start = datetime.strptime(creation_date, "%d/%m/%Y %H:%M:%S").toordinal()
+        except (TypeError, ValueError):
+            start = today
+        if unique_days:
+            start = min(start, unique_days[0])
+
+        dashboard.append({
+            "name": name,
+            "periodicity": periodicity,
+            "count": len(check_ins),
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+            "last_check_in": _last_check_in(calendar, check_ins),
+            "completion_rate": schedule.completion_rate(unique_days, start, today),
+        })
+
+    return dashboard
@@ -0,0 +1,646 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+import queries
+import durability
+from db import initialize_database, get_habits_list, get_counter, get_db, changes_since, last_change_seq, get_timezone
+from analyse import get_dashboard, get_longest_streak
+from habit import Habit
+from search import HabitIndex
+from store import HabitStore
+import sync
+from risk import FeatureTable, RiskEngine
+from storage import MemoryBackend, get_backend
+from report import get_activity, render_report, export_html
+from schedule import SCHEDULE_EXAMPLES, compile_schedule
+from timezones import calendar_for
+
+DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+
+def seed_database(db, habits=1000, checkins=100, start=datetime(2024, 1, 1, 8, 0, 0)):
+    """
+    Fill a database with generated habits and check-ins for benchmarks and tests.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+    habits : int
+        The number of habits to create.
+    checkins : int
+        The number of check-ins to create per habit, one per day.
+    start : datetime
+        The date and time of the first check-in.
+
+    Returns:
+    -------
+    sqlite3.Connection
+        The seeded database connection.
+    """
+    initialize_database(db)
+    creation_date = start.strftime(DATE_FORMAT)
+    db.executemany(queries.INSERT_HABIT, (
+        (f"Habit {i:06d}", f"Generated habit number {i}", "daily" if i % 4 else "weekly", creation_date)
+        for i in range(habits)
+    ))
+    calendar = calendar_for(get_timezone(db))
+    moments = [start + timedelta(days=day) for day in range(checkins)]
+    dates = [(moment.strftime(DATE_FORMAT), calendar.timestamp(moment)) for moment in moments]
+    habit_ids = [row[0] for row in db.execute("SELECT id FROM habits ORDER BY id")]
+    db.executemany(queries.INSERT_COUNTER_AT, ((habit_id, *date) for habit_id in habit_ids for date in dates))
+    db.commit()
+    db.execute("ANALYZE")
+    return db
+
+
+def sample_parameters(name):
+    """
+    Return parameters that make the named statement touch real rows of a seeded database.
+    """
+    habit_name = "Habit 000042"
+    return {
+        "INSERT_HABIT": ("Benchmark habit", "Inserted by the benchmark", "daily", "01/01/2024 08:00:00"),
+        "SELECT_HABIT_BY_NAME": (habit_name,),
+        "SELECT_HABIT_ID_BY_NAME": (habit_name,),
+        "SELECT_HABIT_NAMES_BY_PERIODICITY": ("weekly",),
+        "DELETE_HABIT_BY_ID": (43,),
+        "DELETE_HABIT_BY_NAME": (habit_name,),
+        "INSERT_COUNTER": (43, "01/01/2025 08:00:00"),
+        "INSERT_COUNTER_AT": (43, "01/01/2025 08:00:00", 1735718400),
+        "INSERT_COUNTER_BY_HABIT_NAME": ("01/01/2025 08:00:00", 1735718400, habit_name),
+        "COUNT_COUNTERS_BY_HABIT_ID": (43,),
+        "COUNT_COUNTERS_BY_HABIT_NAME": (habit_name,),
+        "DELETE_COUNTERS_BY_HABIT_ID": (43,),
+        "DELETE_COUNTERS_BY_HABIT_NAME": (habit_name,),
+        "SELECT_HISTORY_BY_HABIT_NAME": (habit_name,),
+        "SELECT_CHANGES_SINCE": (1000, 100),
+        "SELECT_SYNC_CHANGES": (1000, 1100),
+        "SELECT_HABIT_FOR_SYNC": (habit_name,),
+        "UPSERT_SYNC_PEER": ("0123456789abcdef", 1000),
+        "UPDATE_CHANGE_SEQUENCE": (10**6,),
+        "INSERT_CHANGE_SEQUENCE": (10**6,),
+        "INSERT_SYNCED_HABIT": (habit_name, "Synced habit", "daily", "01/01/2024 08:00:00"),
+        "INSERT_SYNCED_CHECK_IN": ("01/01/2025 08:00:00", 1735718400, "0123456789abcdef", "fedcba9876543210",
+                                   habit_name, "0123456789abcdef"),
+        "INSERT_REMOVED_CHECK_IN": ("0123456789abcdef",),
+        "DELETE_COUNTER_BY_UID": ("0123456789abcdef",),
+        "DELETE_EMPTY_HABIT_BY_NAME": (habit_name,),
+        "UPSERT_TIMEZONE": ("Europe/Budapest",),
+        "UPDATE_CHECK_IN_TIMESTAMP": (1735718400, 43),
+        "UPDATE_CHECK_IN_DATE": ("01/01/2025 08:00:00", 43),
+        "SELECT_WEEKLY_COUNTS": (datetime(2024, 1, 1).toordinal() // 7, datetime(2024, 12, 31).toordinal() // 7),
+    }.get(name, ())
+
+
+def query_plan(db, name):
+    """
+    Return the `EXPLAIN QUERY PLAN` details of a registered statement.
+    """
+    rows = db.execute("EXPLAIN QUERY PLAN " + queries.QUERIES[name], sample_parameters(name)).fetchall()
+    return [row[3] for row in rows]
+
+
+def time_query(db, name, repeat=20):
+    """
+    Return the median time in seconds of running a registered statement and fetching all its rows.
+    Changes made by write statements are rolled back after every run.
+    """
+    sql = queries.QUERIES[name]
+    parameters = sample_parameters(name)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.execute(sql, parameters).fetchall()
+        timings.append(time.perf_counter() - start)
+        db.rollback()
+    return statistics.median(timings)
+
+
+def bench_queries(args):
+    db = seed_database(sqlite3.connect(args.database), args.habits, args.checkins)
+    results = {
+        name: {
+            "median_seconds": time_query(db, name, args.repeat),
+            "plan": query_plan(db, name),
+            "hot_path": name in queries.HOT_PATH,
+        }
+        for name in sorted(queries.QUERIES)
+    }
+    db.close()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["queries"]
+
+    print(f"{'query':40} {'median':>12} {'previous':>12} {'ratio':>8}")
+    for name, result in results.items():
+        line = f"{name:40} {result['median_seconds'] * 1000:10.3f}ms"
+        if name in previous:
+            before = previous[name]["median_seconds"]
+            ratio = result["median_seconds"] / before if before else float("inf")
+            line += f" {before * 1000:10.3f}ms {ratio:8.2f}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"habits": args.habits, "checkins": args.checkins, "queries": results}, f, indent=2)
+        print(f"\nTimings written to {args.output}")
+
+
+def count_statements(db, action, repeat):
+    """
+    Run `action` `repeat` times and return the mean number of SQLite statements and seconds per run.
+    """
+    statements = []
+
+    def trace(sql):
+        # A statement is reported again for every trigger it fires, those repeats are not counted
+        if not statements or statements[-1] != sql:
+            statements.append(sql)
+
+    db.set_trace_callback(trace)
+    start = time.perf_counter()
+    for i in range(repeat):
+        action(i)
+    elapsed = time.perf_counter() - start
+    db.set_trace_callback(None)
+    return len(statements) / repeat, elapsed / repeat
+
+
+def bench_store(args):
+    db = seed_database(sqlite3.connect(args.database), args.habits, args.checkins)
+    store = HabitStore(db)
+    name = "Habit 000042"
+    when = datetime(2025, 1, 1, 8, 0, 0)
+
+    def habit_check_in(i):
+        Habit.get_by_name(db, name).increment(db, when)
+
+    def habit_menu_check_in(i):
+        get_habits_list(db)
+        habit_check_in(i)
+
+    def habit_reset(i):
+        Habit.get_by_name(db, f"Habit {i:06d}").reset(db)
+
+    def store_check_in(i):
+        HabitStore(db).check_in(name, when)
+
+    def store_menu_check_in(i):
+        # The same lookups as `main.select_habit`, which searches instead of listing large catalogs
+        store.menu_names()
+        store.check_in(name, when)
+
+    def store_reset(i):
+        HabitStore(db).reset(f"Habit {i:06d}")
+
+    actions = [
+        ("check-in", habit_check_in, store_check_in),
+        ("check-in from the menu", habit_menu_check_in, store_menu_check_in),
+        ("reset", habit_reset, store_reset),
+    ]
+    print(f"{'action':24} {'Habit stmts':>12} {'Habit time':>12} {'store stmts':>12} {'store time':>12}")
+    for action, habit_action, store_action in actions:
+        habit_statements, habit_seconds = count_statements(db, habit_action, args.repeat)
+        store_statements, store_seconds = count_statements(db, store_action, args.repeat)
+        print(f"{action:24} {habit_statements:12.1f} {habit_seconds * 1000:10.3f}ms "
+              f"{store_statements:12.1f} {store_seconds * 1000:10.3f}ms")
+    db.close()
+
+
+def bench_search(args):
+    db = seed_database(sqlite3.connect(args.database), args.habits, 0)
+    start = time.perf_counter()
+    index = HabitIndex.from_db(db)
+    print(f"Indexed {len(index)} habits in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # The first keystroke of a session, with the index built on demand and built before the prompt
+    store = HabitStore(db)
+    start = time.perf_counter()
+    store.search("habit 0421")
+    lazy_seconds = time.perf_counter() - start
+    store = HabitStore(db)
+    store.index()
+    start = time.perf_counter()
+    store.search("habit 0421")
+    prebuilt_seconds = time.perf_counter() - start
+    print(f"First lookup: {lazy_seconds * 1000:.1f}ms with the index built on demand, "
+          f"{prebuilt_seconds * 1000:.3f}ms with the index built before the prompt\n")
+    db.close()
+
+    lookups = [
+        ("prefix, first page", lambda: index.prefix("habit 0421")),
+        ("prefix, page 50", lambda: index.prefix("habit", offset=1000, limit=20)),
+        ("description word", lambda: index.prefix("generated number 4242")),
+        ("fuzzy", lambda: index.fuzzy("hbait 04217")),
+        ("type-ahead with typo", lambda: index.search("habti 4217")),
+    ]
+    print(f"{'lookup':24} {'median':>10} {'p99':>10}")
+    for label, lookup in lookups:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            lookup()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{label:24} {statistics.median(timings) * 1000:8.3f}ms {p99 * 1000:8.3f}ms")
+
+
+def bench_dashboard(args):
+    print(f"{'habits':>8} {'rows':>10} {'dashboard':>12} {'stmts':>6} {'per row':>10} "
+          f"{'per-habit':>12} {'stmts':>6}")
+    for habits in (args.habits // 4, args.habits // 2, args.habits):
+        db = seed_database(sqlite3.connect(args.database), habits, args.checkins)
+        rows = habits * args.checkins
+
+        def dashboard(i):
+            get_dashboard(db)
+
+        def per_habit(i):
+            for name in get_habits_list(db):
+                get_counter(db, name)
+                get_longest_streak(db, name)
+
+        dashboard_statements, dashboard_seconds = count_statements(db, dashboard, 1)
+        per_habit_statements, per_habit_seconds = count_statements(db, per_habit, 1)
+        print(f"{habits:8d} {rows:10d} {dashboard_seconds * 1000:10.1f}ms {dashboard_statements:6.0f} "
+              f"{dashboard_seconds / rows * 1e6:8.2f}us {per_habit_seconds * 1000:10.1f}ms {per_habit_statements:6.0f}")
+        db.close()
+
+
+def bench_changes(args):
+    path = os.path.join(tempfile.mkdtemp(), "changes.db")
+    seed_database(get_db(path), args.habits, 0).close()
+
+    written = [0]
+    done = threading.Event()
+
+    def writer():
+        store = HabitStore(get_db(path))
+        names = store.names()
+        interval = 1 / args.rate
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.seconds:
+            store.check_in(names[written[0] % len(names)])
+            written[0] += 1
+            # Pace the writes to the target rate
+            delay = start + written[0] * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        done.set()
+
+    consumer_db = get_db(path)
+    seq = last_change_seq(consumer_db)
+    consumed = 0
+    max_lag = 0
+    busy_seconds = 0.0
+    thread = threading.Thread(target=writer)
+    start = time.perf_counter()
+    thread.start()
+    while True:
+        finished = done.is_set()
+        poll_start = time.perf_counter()
+        changes = changes_since(consumer_db, seq, args.batch)
+        busy_seconds += time.perf_counter() - poll_start
+        if changes:
+            seq = changes[-1]["seq"]
+            consumed += len(changes)
+            max_lag = max(max_lag, written[0] - consumed)
+        elif finished:
+            break
+        else:
+            time.sleep(args.poll)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    consumer_db.close()
+
+    print(f"check-ins written:  {written[0]} ({written[0] / elapsed:.0f}/s, target {args.rate}/s)")
+    print(f"changes consumed:   {consumed}")
+    print(f"max consumer lag:   {max_lag} changes")
+    print(f"consumer busy time: {busy_seconds / elapsed:.1%} of wall time, "
+          f"{busy_seconds / max(consumed, 1) * 1e6:.1f}us per change")
+
+
+def bench_sync(args):
+    print(f"{'check-ins':>10} {'first sync':>12} {'bytes':>10} {'delta sync':>12} {'bytes':>8}")
+    directory = tempfile.mkdtemp()
+    for checkins in (args.checkins // 4, args.checkins // 2, args.checkins):
+        phone = seed_database(get_db(os.path.join(directory, f"phone-{checkins}.db")), args.habits, checkins)
+        laptop = get_db(os.path.join(directory, f"laptop-{checkins}.db"))
+        start = time.perf_counter()
+        first_bytes = sum(sync.sync(phone, laptop))
+        first_seconds = time.perf_counter() - start
+
+        store = HabitStore(phone)
+        names = store.names()
+        for i in range(args.changes):
+            store.check_in(names[i % len(names)])
+        start = time.perf_counter()
+        delta_bytes = sum(sync.sync(phone, laptop))
+        delta_seconds = time.perf_counter() - start
+        print(f"{args.habits * checkins:10d} {first_seconds * 1000:10.1f}ms {first_bytes:10d} "
+              f"{delta_seconds * 1000:10.1f}ms {delta_bytes:8d}")
+        phone.close()
+        laptop.close()
+
+
+def bench_risk(args):
+    start_day = datetime(2024, 1, 1).toordinal()
+    table = FeatureTable()
+    start = time.perf_counter()
+    for i in range(args.habits):
+        row = table.add_habit(7 if i % 4 == 0 else 1)
+        day = start_day
+        for j in range(args.checkins):
+            # Mostly daily cadence with a skipped day now and then
+            day += 1 + (i + j) % 5 // 4
+            table.add_check_in(row, day, 420 + (i * 37 + j * 11) % 600)
+    build_seconds = time.perf_counter() - start
+    size = sum(column.itemsize * len(column) for column in vars(table).values())
+    print(f"features of {args.habits} habits: built in {build_seconds:.2f}s "
+          f"({build_seconds / (args.habits * args.checkins) * 1e6:.2f}us per check-in), {size / 2**20:.1f} MiB")
+
+    rows = range(len(table))
+    for label, today in (("all due today", day + 1), ("all checked off today", day)):
+        start = time.perf_counter()
+        scores = table.score(rows, today, 12 * 60)
+        seconds = time.perf_counter() - start
+        print(f"batch score, {label}: {seconds * 1000:.0f}ms ({seconds / len(scores) * 1e6:.2f}us per habit), "
+              f"{sum(score >= 0.5 for score in scores)} at risk")
+
+    backend = MemoryBackend()
+    habit_ids = [backend.add_habit(f"Habit {i:06d}", "", "weekly" if i % 4 == 0 else "daily", None)
+                 for i in range(args.store_habits)]
+    backend.add_check_ins((habit_id, (datetime(2024, 1, 1, 8, 0, 0) + timedelta(days=j)).strftime(DATE_FORMAT))
+                          for habit_id in habit_ids for j in range(args.checkins))
+    engine = RiskEngine(backend)
+    at = datetime(2024, 1, 1, 12, 0, 0) + timedelta(days=args.checkins)
+    timings = []
+    for label in ("first call", "cached", "after one write"):
+        if label == "after one write":
+            backend.add_check_in(habit_ids[0], at.strftime(DATE_FORMAT))
+        start = time.perf_counter()
+        engine.scores(at)
+        timings.append(f"{label} {(time.perf_counter() - start) * 1000:.2f}ms")
+    print(f"RiskEngine on {args.store_habits} habits: " + ", ".join(timings))
+
+
+def gap_streak(days, gap_threshold):
+    """
+    The daily/weekly streak loop used before schedules were compiled, kept as the baseline.
+    """
+    longest, current = 0, 1
+    for i in range(1, len(days)):
+        if days[i] - days[i - 1] <= gap_threshold:
+            current += 1
+        else:
+            longest, current = max(longest, current), 1
+    return max(longest, current)
+
+
+def bench_schedules(args):
+    first = datetime(2020, 1, 1).toordinal()
+    # Check-ins on most days, with a day off every now and then
+    days = [first + i for i in range(args.days) if i % 11 != 10]
+    print(f"{'schedule':>22} {'per day':>10}")
+    for label, action in [("daily (old gap loop)", lambda: gap_streak(days, 1)),
+                          ("weekly (old gap loop)", lambda: gap_streak(days, 7))] + \
+            [(text, lambda schedule=compile_schedule(text): schedule.streaks(days, days[-1]))
+             for text in SCHEDULE_EXAMPLES]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            action()
+            timings.append(time.perf_counter() - start)
+        print(f"{label:>22} {statistics.median(timings) / len(days) * 1e9:8.0f}ns")
+
+
+def bench_timezones(args):
+    start = time.perf_counter()
+    calendar = calendar_for(args.timezone)
+    print(f"transition table of {args.timezone}: {len(calendar._starts)} offsets, "
+          f"built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    first = int(datetime(2020, 1, 1).timestamp())
+    # Check-ins spread over about five years, so the DST transitions of every year are crossed
+    timestamps = [first + i * 157 for i in range(args.checkins)]
+    timings = {}
+    for label, action in (("zoneinfo per row", lambda: [datetime.fromtimestamp(ts, calendar.zone).date().toordinal()
+                                                         for ts in timestamps]),
+                          ("transition table", lambda: calendar.days(timestamps))):
+        start = time.perf_counter()
+        timings[label] = action()
+        seconds = time.perf_counter() - start
+        print(f"{label:>16}: {seconds * 1000:.0f}ms ({seconds / len(timestamps) * 1e9:.0f}ns per check-in)")
+    assert timings["zoneinfo per row"] == timings["transition table"]
+
+
+def bench_report(args):
+    db = seed_database(sqlite3.connect(args.database), args.habits, args.checkins)
+    today = (datetime(2024, 1, 1) + timedelta(days=args.checkins - 1)).date()
+    first_day = today.toordinal() - 7 * args.weeks
+    path = os.path.join(tempfile.mkdtemp(), "report.html")
+    activity = get_activity(db, args.weeks, today)
+
+    def per_habit(i):
+        # The check-ins of every habit, bucketed into local days one habit at a time
+        backend = get_backend(db)
+        calendar = calendar_for(backend.timezone())
+        for name in backend.habit_names():
+            days = calendar.check_in_days((row[0], row[2]) for row in backend.history(name))
+            counts = {}
+            for day in days:
+                if day >= first_day:
+                    counts[day] = counts.get(day, 0) + 1
+
+    print(f"{args.habits} habits, {args.checkins} check-ins each, {args.weeks} weeks")
+    for label, action in (("aggregates", lambda i: get_activity(db, args.weeks, today)),
+                          ("per-habit history", per_habit),
+                          ("render terminal report", lambda i: render_report(activity)),
+                          ("export HTML", lambda i: export_html(activity, path))):
+        statements, seconds = count_statements(db, action, args.repeat)
+        print(f"{label:>22}: {seconds * 1000:8.1f}ms {statements:6.0f} statements")
+    print(f"HTML report: {os.path.getsize(path) / 2**10:.0f} KiB")
+    db.close()
+
+
+def bench_durability(args):
+    directory = tempfile.mkdtemp()
+    print(f"{args.checkins} check-ins on {args.habits} habits, one commit each")
+    print(f"{'profile':>8} {'check-ins/s':>12} {'mean':>9} {'p99':>9} {'max':>9}")
+    for profile in durability.DURABILITY_PROFILES:
+        path = os.path.join(directory, f"{profile}.db")
+        store = HabitStore(seed_database(get_db(path, profile, args.checkpoint_interval), args.habits, 0))
+        names = store.names()
+        latencies = []
+        start = time.perf_counter()
+        for i in range(args.checkins):
+            check_in_start = time.perf_counter()
+            store.check_in(names[i % len(names)])
+            latencies.append(time.perf_counter() - check_in_start)
+        seconds = time.perf_counter() - start
+        store.db.close()
+        latencies.sort()
+        print(f"{profile:>8} {args.checkins / seconds:12.0f} {seconds / args.checkins * 1e6:7.0f}us "
+              f"{latencies[int(len(latencies) * 0.99)] * 1e6:7.0f}us {latencies[-1] * 1e6:7.0f}us")
+
+
+def bench_backup(args):
+    directory = args.directory or tempfile.mkdtemp()
+    path = os.path.join(directory, "habits.db")
+    backup_path = os.path.join(directory, "backup.db")
+    restore_path = os.path.join(directory, "restored.db")
+    for name in (path, backup_path, restore_path):
+        if os.path.exists(name):
+            os.remove(name)
+
+    db = seed_database(get_db(path, "normal"), args.habits, args.checkins)
+    # Pad the file to the target size with pages of random data, 64 MiB per transaction
+    db.execute("CREATE TABLE benchmark_padding (data BLOB)")
+    while os.path.getsize(path) < args.gigabytes * 2**30:
+        db.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 16384) "
+                   "INSERT INTO benchmark_padding (data) SELECT randomblob(4000) FROM n")
+        db.commit()
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+    size = os.path.getsize(path)
+
+    db = get_db(path, args.durability)
+    finished = threading.Event()
+    latencies = []
+
+    def writer():
+        store = HabitStore(get_db(path, args.durability))
+        names = store.names()
+        while not finished.is_set():
+            start = time.perf_counter()
+            store.check_in(names[len(latencies) % len(names)])
+            latencies.append(time.perf_counter() - start)
+        store.db.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    start = time.perf_counter()
+    checksum = durability.backup(db, backup_path, args.pages)
+    backup_seconds = time.perf_counter() - start
+    finished.set()
+    thread.join()
+    start = time.perf_counter()
+    durability.file_checksum(backup_path)
+    checksum_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    durability.restore(backup_path, restore_path, checksum, args.pages)
+    restore_seconds = time.perf_counter() - start
+    db.close()
+
+    print(f"database:         {size / 2**30:.2f} GiB, {args.habits * args.checkins} check-ins")
+    print(f"backup:           {backup_seconds:.1f}s ({size / 2**20 / backup_seconds:.0f} MiB/s), "
+          f"of which {checksum_seconds:.1f}s checksum")
+    print(f"during backup:    {len(latencies)} check-ins ({len(latencies) / backup_seconds:.0f}/s, "
+          f"{args.durability}), longest {max(latencies, default=0) * 1000:.1f}ms")
+    print(f"restore:          {restore_seconds:.1f}s, checksum and consistency check included")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Habit Tracker benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    parser_queries = subparsers.add_parser("queries", help="time every registered SQL statement at scale")
+    parser_queries.add_argument("--habits", type=int, default=10000)
+    parser_queries.add_argument("--checkins", type=int, default=100, help="check-ins per habit")
+    parser_queries.add_argument("--repeat", type=int, default=20)
+    parser_queries.add_argument("--database", default=":memory:")
+    parser_queries.add_argument("--output", metavar="PATH", help="save the timings as JSON")
+    parser_queries.add_argument("--compare", metavar="PATH", help="compare with timings saved by an earlier run")
+    parser_queries.set_defaults(func=bench_queries)
+
+    parser_store = subparsers.add_parser("store", help="compare statements per user action of Habit and HabitStore")
+    parser_store.add_argument("--habits", type=int, default=10000)
+    parser_store.add_argument("--checkins", type=int, default=10, help="check-ins per habit")
+    parser_store.add_argument("--repeat", type=int, default=100)
+    parser_store.add_argument("--database", default=":memory:")
+    parser_store.set_defaults(func=bench_store)
+
+    parser_search = subparsers.add_parser("search", help="time type-ahead lookups on a large habit catalog")
+    parser_search.add_argument("--habits", type=int, default=100000)
+    parser_search.add_argument("--repeat", type=int, default=100)
+    parser_search.add_argument("--database", default=":memory:")
+    parser_search.set_defaults(func=bench_search)
+
+    parser_dashboard = subparsers.add_parser("dashboard", help="compare get_dashboard with per-habit queries")
+    parser_dashboard.add_argument("--habits", type=int, default=4000)
+    parser_dashboard.add_argument("--checkins", type=int, default=100, help="check-ins per habit")
+    parser_dashboard.add_argument("--database", default=":memory:")
+    parser_dashboard.set_defaults(func=bench_dashboard)
+
+    parser_changes = subparsers.add_parser("changes", help="tail the change log under a sustained write rate")
+    parser_changes.add_argument("--habits", type=int, default=1000)
+    parser_changes.add_argument("--rate", type=int, default=2000, help="target check-ins per second")
+    parser_changes.add_argument("--seconds", type=float, default=5)
+    parser_changes.add_argument("--batch", type=int, default=1000, help="changes fetched per poll")
+    parser_changes.add_argument("--poll", type=float, default=0.01, help="seconds between empty polls")
+    parser_changes.set_defaults(func=bench_changes)
+
+    parser_sync = subparsers.add_parser("sync", help="compare the first sync with a delta sync at growing history sizes")
+    parser_sync.add_argument("--habits", type=int, default=1000)
+    parser_sync.add_argument("--checkins", type=int, default=100, help="check-ins per habit")
+    parser_sync.add_argument("--changes", type=int, default=100, help="check-ins made between the two syncs")
+    parser_sync.set_defaults(func=bench_sync)
+
+    parser_risk = subparsers.add_parser("risk", help="time building and scoring the at-risk features")
+    parser_risk.add_argument("--habits", type=int, default=1000000)
+    parser_risk.add_argument("--checkins", type=int, default=10, help="check-ins per habit")
+    parser_risk.add_argument("--store-habits", type=int, default=100000,
+                             help="habits in the storage backend followed by the RiskEngine")
+    parser_risk.set_defaults(func=bench_risk)
+
+    parser_schedules = subparsers.add_parser("schedules", help="compare the streak cost per check-in day of every schedule")
+    parser_schedules.add_argument("--days", type=int, default=100000)
+    parser_schedules.add_argument("--repeat", type=int, default=20)
+    parser_schedules.set_defaults(func=bench_schedules)
+
+    parser_timezones = subparsers.add_parser("timezones", help="compare bucketing check-ins into local days with zoneinfo")
+    parser_timezones.add_argument("--checkins", type=int, default=1000000)
+    parser_timezones.add_argument("--timezone", default="America/New_York")
+    parser_timezones.set_defaults(func=bench_timezones)
+
+    parser_report = subparsers.add_parser("report", help="time reading and rendering the heatmaps and trends of every habit")
+    parser_report.add_argument("--habits", type=int, default=500)
+    parser_report.add_argument("--checkins", type=int, default=365, help="check-ins per habit, one per day")
+    parser_report.add_argument("--weeks", type=int, default=53)
+    parser_report.add_argument("--repeat", type=int, default=5)
+    parser_report.add_argument("--database", default=":memory:")
+    parser_report.set_defaults(func=bench_report)
+
+    parser_durability = subparsers.add_parser("durability", help="compare the check-in throughput of every durability profile")
+    parser_durability.add_argument("--habits", type=int, default=1000)
+    parser_durability.add_argument("--checkins", type=int, default=5000, help="check-ins in total")
+    parser_durability.add_argument("--checkpoint-interval", type=float, default=durability.CHECKPOINT_INTERVAL,
+                                   help="seconds between the checkpoints of the relaxed profile")
+    parser_durability.set_defaults(func=bench_durability)
+
+    parser_backup = subparsers.add_parser("backup", help="time a hot backup and a verified restore of a large database")
+    parser_backup.add_argument("--gigabytes", type=float, default=2, help="size of the database")
+    parser_backup.add_argument("--habits", type=int, default=1000)
+    parser_backup.add_argument("--checkins", type=int, default=365, help="check-ins per habit")
+    parser_backup.add_argument("--pages", type=int, default=durability.BACKUP_PAGES, help="pages copied per step")
+    parser_backup.add_argument("--durability", choices=list(durability.DURABILITY_PROFILES),
+                               default=durability.DEFAULT_DURABILITY, help="profile of the writer during the backup")
+    parser_backup.add_argument("--directory", help="where to create the files, defaults to a temporary directory")
+    parser_backup.set_defaults(func=bench_backup)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    arguments.func(arguments)
@@ -1,85 +1,76 @@
 import sqlite3
+from durability import CHECKPOINT_INTERVAL, DEFAULT_DURABILITY, DurableConnection, set_durability
+from profiling import instrument, instrument_connection, is_enabled
+from storage import ensure_schema, get_backend
 
+@instrument
 def initialize_database(db):
-    cursor = db.cursor()
-    # Create the `habits` table if it doesn't exist
-    cursor.execute('''CREATE TABLE IF NOT EXISTS habits (
-                        id INTEGER PRIMARY KEY,
-                        name TEXT UNIQUE NOT NULL,
-                        description TEXT,
-                        periodicity TEXT NOT NULL,
-                        creation_date TEXT
-                    )''')
-
-    # Create the `counters` table if it doesn't exist
-    cursor.execute('''CREATE TABLE IF NOT EXISTS counters (
-                        id INTEGER PRIMARY KEY,
-                        habit_id INTEGER,
-                        increment_date TEXT,
-                        FOREIGN KEY (habit_id) REFERENCES habits (id)
-                    )''')
-    db.commit()
-
-
-def get_db():
+    # Create the `habits` and `counters` tables and their indexes if they don't exist
+    get_backend(db).initialize()
+
+
+@instrument
+def get_db(path='main.db', durability=DEFAULT_DURABILITY, checkpoint_interval=CHECKPOINT_INTERVAL):
     """
         Initialize and return the database connection, creating the tables habits and counters if they do not exist.
+        The schema is only set up the first time a file is opened, as tracked by its `user_version`.
+
+        Parameters:
+        ----------
+        path : str
+            The path of the database file.
+        durability : str
+            How commits are made durable: "strict" flushes every commit to disk, "normal" survives crashes
+            of the app but a power loss can undo the latest commits, and "relaxed" flushes commits with a
+            background checkpoint every `checkpoint_interval` seconds. See `durability.DURABILITY_PROFILES`.
+        checkpoint_interval : float
+            The number of seconds between the checkpoints of the relaxed profile.
 
         Returns:
         -------
         sqlite3.Connection
             The database connection object.
+
+        Raises:
+        ------
+        ValueError
+            If the durability profile is unknown.
         """
-    db = sqlite3.connect('main.db')
-    cursor = db.cursor()
-    cursor.execute('''
-            CREATE TABLE IF NOT EXISTS habits (
-                id INTEGER PRIMARY KEY,
-                name TEXT UNIQUE NOT NULL,
-                description TEXT,
-                periodicity TEXT NOT NULL,
-                creation_date TEXT
-            )
-        ''')
-    cursor.execute('''
-            CREATE TABLE IF NOT EXISTS counters (
-                id INTEGER PRIMARY KEY,
-                habit_id INTEGER NOT NULL,
-                increment_date TEXT NOT NULL,
-                FOREIGN KEY (habit_id) REFERENCES habits (id)
-            )
-        ''')
-    db.commit()
+    db = sqlite3.connect(path, factory=DurableConnection)
+    if is_enabled():
+        instrument_connection(db)
+    set_durability(db, durability, checkpoint_interval)
+    ensure_schema(db)
     return db
 
 
+@instrument
 def get_habits_list(db):
     """
        Retrieve a list of all the habits from the database.
 
        Parameters:
        ----------
-       db : sqlite3.Connection
-           The database connection object.
+       db : StorageBackend or sqlite3.Connection
+           The storage backend or database connection object.
 
        Returns:
        -------
        List[str]
            A list of habit names.
        """
-    cursor = db.cursor()
-    cursor.execute('SELECT name FROM habits')
-    return [row[0] for row in cursor.fetchall()]
+    return get_backend(db).habit_names()
 
 
+@instrument
 def get_habits_by_periodicity(db, periodicity):
     """
     Retrieve a list of habit names filtered by their periodicity.
 
     Parameters:
     ----------
-    db : sqlite3.Connection
-        The database connection object.
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
     periodicity : str
         The periodicity to filter by. (daily or weekly)
 
@@ -88,19 +79,18 @@ def get_habits_by_periodicity(db, periodicity):
     List[str]
         A list of habit names matching the given periodicity.
     """
-    cursor = db.cursor()
-    cursor.execute('SELECT name FROM habits WHERE periodicity = ?', (periodicity,))
-    return[row[0]for row in cursor.fetchall()]
+    return get_backend(db).habit_names(periodicity)
 
 
+@instrument
 def get_counter(db, name):
     """
        Retrieve a Counter object for a given habit name.
 
        Parameters:
        ----------
-       db : sqlite3.Connection
-           The database connection object.
+       db : StorageBackend or sqlite3.Connection
+           The storage backend or database connection object.
        name : str
            The name of the habit.
 
@@ -109,15 +99,92 @@ def get_counter(db, name):
        Optional[Counter]
            A Counter object if the habit exists, otherwise None.
     """
-    cursor = db.cursor()
-    cursor.execute('SELECT id FROM habits WHERE name = ?', (name,))
-    habit = cursor.fetchone()
-    if not habit:
+    backend = get_backend(db)
+    habit_id = backend.habit_id(name)
+    if habit_id is None:
         return 0
 
-    habit_id = habit[0]
+    return backend.count_check_ins(habit_id)
+
+CHANGE_FIELDS = ("seq", "operation", "habit_id", "habit_name", "counter_id", "increment_date")
+
+
+@instrument
+def changes_since(db, seq=0, limit=100):
+    """
+    Retrieve the entries of the change log that come after a given sequence number, oldest first.
+    Consumers keep the `seq` of the last entry they processed and pass it to the next call.
+
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
+    seq : int
+        The sequence number of the last change already processed, 0 to start from the oldest kept change.
+    limit : int
+        The maximum number of changes to return.
+
+    Returns:
+    -------
+    List[dict]
+        One dictionary per change with the keys seq, operation ("habit_added", "habit_deleted",
+        "check_in_added" or "check_in_removed"), habit_id, habit_name, counter_id and increment_date.
+    """
+    return [dict(zip(CHANGE_FIELDS, row)) for row in get_backend(db).changes_since(seq, limit)]
+
 
-    cursor.execute('SELECT COUNT(*) FROM counters WHERE habit_id = ?', (habit_id,))
-    count = cursor.fetchone()[0]
+@instrument
+def get_timezone(db):
+    """
+    Retrieve the timezone the user's check-ins are counted in, e.g. for days and streaks.
 
-    return count
\ No newline at end of file
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
+
+    Returns:
+    -------
+    str
+        The IANA name of the timezone, e.g. "Europe/Budapest".
+    """
+    return get_backend(db).timezone()
+
+
+@instrument
+def set_timezone(db, name):
+    """
+    Change the timezone the user's check-ins are counted in. Check-ins keep their moment in UTC,
+    so after moving, past check-ins are counted on the days they fall on in the new timezone.
+
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
+    name : str
+        The IANA name of the timezone, e.g. "America/New_York".
+
+    Raises:
+    ------
+    ValueError
+        If the timezone is unknown.
+    """
+    get_backend(db).set_timezone(name)
+
+
+@instrument
+def last_change_seq(db):
+    """
+    Retrieve the sequence number of the latest change, so a new consumer can start tailing from now.
+
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
+
+    Returns:
+    -------
+    int
+        The latest sequence number, 0 if nothing has changed yet.
+    """
+    return get_backend(db).last_change_seq()
@@ -1,33 +1,18 @@
-import sqlite3
 from datetime import datetime
+from storage import get_backend
+from timezones import calendar_for
 
 def preload_example_data(db):
     """
     Preload the database with predefined habits and their respective increment dates.
     """
-    cursor = db.cursor()
+    backend = get_backend(db)
 
     # Create tables if they do not exist
-    cursor.execute('''CREATE TABLE IF NOT EXISTS habits (
-                        id INTEGER PRIMARY KEY,
-                        name TEXT UNIQUE NOT NULL,
-                        description TEXT,
-                        periodicity TEXT NOT NULL,
-                        creation_date TEXT
-                    )''')
-
-    cursor.execute('''CREATE TABLE IF NOT EXISTS counters (
-                        id INTEGER PRIMARY KEY,
-                        habit_id INTEGER,
-                        increment_date TEXT,
-                        FOREIGN KEY (habit_id) REFERENCES habits (id)
-                    )''')
-    db.commit()
+    backend.initialize()
 
     # Clear existing data
-    cursor.execute('DELETE FROM counters')
-    cursor.execute('DELETE FROM habits')
-    db.commit()
+    backend.clear()
 
     # Example habits
     habits = [
@@ -41,12 +26,7 @@ def preload_example_data(db):
     # Add habits to the database
     habit_ids = []
     for habit in habits:
-        cursor.execute('''
-               INSERT INTO habits (name, description, periodicity, creation_date)
-               VALUES (?, ?, ?, ?)
-           ''', (habit[0], habit[1], habit[2], datetime.now().strftime("%d/%m/%Y %H:%M:%S")))
-        habit_ids.append(cursor.lastrowid)
-    db.commit()
+        habit_ids.append(backend.add_habit(habit[0], habit[1], habit[2], datetime.now().strftime("%d/%m/%Y %H:%M:%S")))
 
     # Define specific increment dates for each habit
     increment_dates = {
@@ -81,14 +61,10 @@ def preload_example_data(db):
         ]
     }
 
-    # Insert increment dates for each habit
-    for habit_id, dates in increment_dates.items():
-        for date in dates:
-            cursor.execute('''
-                   INSERT INTO counters (habit_id, increment_date)
-                   VALUES (?, ?)
-               ''', (habit_id, date))  # Store date as a string
-    db.commit()
+    # Insert increment dates for each habit, in the local time of the user's timezone
+    calendar = calendar_for(backend.timezone())
+    backend.add_check_ins((habit_id, date, calendar.parse(date))
+                          for habit_id, dates in increment_dates.items() for date in dates)
 
     return db  # Return the database connection
 
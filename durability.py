@@ -0,0 +1,277 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import queries
+from storage import ensure_schema
+from sync import start_as_new_device
+
+# SQLite settings of the durability profiles a database can be opened with, see `db.get_db`.
+# All of them use write-ahead logging, so readers and hot backups never block the writer.
+#   strict   every commit is flushed to disk before it returns and survives a power loss
+#   normal   commits survive the app crashing; a power loss can undo the latest ones, but never corrupts the file
+#   relaxed  commits are not flushed, and a background checkpoint writes them into the database file and
+#            flushes it every CHECKPOINT_INTERVAL seconds, so a power loss undoes at most that many seconds
+DURABILITY_PROFILES = {
+    "strict": {"journal_mode": "WAL", "synchronous": "FULL"},
+    "normal": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+    "relaxed": {"journal_mode": "WAL", "synchronous": "OFF", "wal_autocheckpoint": 0},
+}
+DEFAULT_DURABILITY = "strict"
+
+# Seconds between the background checkpoints of the relaxed profile.
+CHECKPOINT_INTERVAL = 5.0
+
+# Pages copied per step of a backup or restore, 16 MiB with the default page size of 4 KiB.
+BACKUP_PAGES = 4096
+
+# The checksum of a backup is saved next to it in a file with this suffix, in the format of `sha256sum`.
+CHECKSUM_SUFFIX = ".sha256"
+
+CHUNK_SIZE = 2**20
+
+
+class Checkpointer(threading.Thread):
+    """
+        Checkpoints the write-ahead log of a database file at a fixed interval.
+
+        The checkpoints run on a connection of their own that flushes what it writes,
+        so a connection opened with synchronous=OFF never waits for the disk itself.
+        """
+
+    def __init__(self, path, interval=CHECKPOINT_INTERVAL):
+        """
+               Initialize a Checkpointer instance. Call `start` to begin checkpointing.
+
+               Parameters:
+                   path (str): The path of the database file.
+                   interval (float): The number of seconds between checkpoints.
+               """
+        super().__init__(name=f"checkpoint {path}", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.checkpoints = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA synchronous = NORMAL")
+        try:
+            while not self._stopped.wait(self.interval):
+                self.checkpoint(db)
+            # Whatever was committed before the stop is made durable
+            self.checkpoint(db)
+        finally:
+            db.close()
+
+    def checkpoint(self, db):
+        """
+                Copy the committed pages of the log into the database file without waiting for readers or writers.
+                """
+        db.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        self.checkpoints += 1
+
+    def stop(self):
+        """
+                Run a last checkpoint and wait for the thread to finish.
+                """
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+
+
+class DurableConnection(sqlite3.Connection):
+    """
+        A database connection that stops its background checkpoints when it is closed.
+
+        Attributes:
+            durability (str): The durability profile the connection was set up with.
+            checkpointer (Checkpointer): The background checkpoints of the relaxed profile, or None.
+        """
+
+    durability = None
+    checkpointer = None
+
+    def close(self):
+        if self.checkpointer is not None:
+            self.checkpointer.stop()
+            self.checkpointer = None
+        super().close()
+
+
+def _database_file(db):
+    """
+    Return the path of the main database file of a connection, or an empty string for an in-memory database.
+    """
+    return db.execute("PRAGMA database_list").fetchone()[2]
+
+
+def set_durability(db, profile=DEFAULT_DURABILITY, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """
+    Apply a durability profile to a database connection. The relaxed profile also starts the background
+    checkpoints if the connection is a DurableConnection on a database file.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object, outside of a transaction.
+    profile : str
+        The name of the profile: "strict", "normal" or "relaxed".
+    checkpoint_interval : float
+        The number of seconds between the checkpoints of the relaxed profile.
+
+    Raises:
+    ------
+    ValueError
+        If the profile is unknown.
+    """
+    if profile not in DURABILITY_PROFILES:
+        raise ValueError(f"Unknown durability profile '{profile}'. Use one of: {', '.join(DURABILITY_PROFILES)}.")
+    settings = DURABILITY_PROFILES[profile]
+    # An in-memory database keeps its journal in memory, and has nothing to flush or checkpoint
+    journal_mode = db.execute(f"PRAGMA journal_mode = {settings['journal_mode']}").fetchone()[0]
+    for name, value in settings.items():
+        if name != "journal_mode":
+            db.execute(f"PRAGMA {name} = {value}")
+
+    if isinstance(db, DurableConnection):
+        if db.checkpointer is not None:
+            db.checkpointer.stop()
+            db.checkpointer = None
+        if settings.get("wal_autocheckpoint") == 0 and journal_mode == "wal":
+            db.checkpointer = Checkpointer(_database_file(db), checkpoint_interval)
+            db.checkpointer.start()
+        db.durability = profile
+
+
+def file_checksum(path):
+    """
+    Return the SHA-256 checksum of a file as a hexadecimal string, reading it in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_checksum(path):
+    """
+    Return the checksum saved next to a backup by `backup`.
+
+    Raises:
+    ------
+    ValueError
+        If the backup has no checksum file.
+    """
+    try:
+        with open(path + CHECKSUM_SUFFIX, encoding="utf-8") as file:
+            return file.read().split()[0]
+    except (FileNotFoundError, IndexError):
+        raise ValueError(f"The backup '{path}' has no checksum file '{path}{CHECKSUM_SUFFIX}'.")
+
+
+def backup(db, path, pages=BACKUP_PAGES, progress=None):
+    """
+    Copy a live database to a file with the SQLite online backup API, and save the checksum of the copy
+    next to it. The copy is made on a connection of its own from the snapshot of the database when the
+    backup starts, a few pages at a time: writes made in the meantime wait for no step and are left out
+    of the copy, and never make it start over.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object. An in-memory database is copied on this connection.
+    path : str
+        The backup file to write. An existing file is only replaced once the copy is complete.
+    pages : int
+        The number of pages copied per step.
+    progress : callable, optional
+        Called after every step as progress(status, remaining, total), with the number of pages.
+
+    Returns:
+    -------
+    str
+        The SHA-256 checksum of the backup file.
+    """
+    source_file = _database_file(db)
+    source = sqlite3.connect(source_file) if source_file else db
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    target = sqlite3.connect(partial)
+    try:
+        if source is not db:
+            # An open read transaction pins the snapshot the steps are copied from. With write-ahead
+            # logging it does not block writers, which append to the log past the snapshot.
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=progress)
+        # The copy is a single self-contained file whatever the journal mode of the database
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+        if source is not db:
+            source.close()
+
+    checksum = file_checksum(partial)
+    os.replace(partial, path)
+    with open(path + CHECKSUM_SUFFIX, "w", encoding="utf-8") as file:
+        file.write(f"{checksum}  {os.path.basename(path)}\n")
+    return checksum
+
+
+def restore(path, target, checksum=None, pages=BACKUP_PAGES):
+    """
+    Restore a backup into a database file, after checking that the backup still has the checksum it was
+    saved with. The restored database is checked for consistency before this returns. Other connections
+    to the target may stay open, they see the restored content with their next transaction.
+
+    The restored database syncs as a new device, see `sync.start_as_new_device`, and its change log
+    goes on from the highest sequence number the target had handed out, so neither sync peers nor
+    change log consumers mistake new changes for ones they have already seen.
+
+    Parameters:
+    ----------
+    path : str
+        The backup file, as written by `backup`.
+    target : str
+        The path of the database file to overwrite.
+    checksum : str, optional
+        The expected SHA-256 checksum. Defaults to the one saved next to the backup.
+    pages : int
+        The number of pages copied per step.
+
+    Returns:
+    -------
+    str
+        The verified checksum of the backup.
+
+    Raises:
+    ------
+    ValueError
+        If the backup does not match the checksum, or the restored database is damaged.
+    """
+    expected = checksum or read_checksum(path)
+    actual = file_checksum(path)
+    if actual != expected:
+        raise ValueError(f"The backup '{path}' does not match its checksum, it may be damaged.")
+
+    source = sqlite3.connect(path)
+    destination = sqlite3.connect(target)
+    try:
+        try:
+            last_seq = destination.execute(queries.SELECT_CHANGE_SEQUENCE).fetchone()[0]
+        except sqlite3.OperationalError:
+            # The target is new or has never logged a change
+            last_seq = 0
+        source.backup(destination, pages=pages)
+        ensure_schema(destination)
+        start_as_new_device(destination, last_seq)
+        result = destination.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        source.close()
+        destination.close()
+    if result != "ok":
+        raise ValueError(f"The database restored from '{path}' failed its consistency check: {result}.")
+    return actual
@@ -1,4 +1,8 @@
 from datetime import datetime
+from profiling import instrument
+from schedule import normalize_schedule
+from timezones import calendar_for
+from storage import get_backend
 
 
 class Habit:
@@ -8,7 +12,8 @@ class Habit:
         Attributes:
             name (str): The name of the habit.
             description (str): A brief description of the habit.
-            periodicity (str): The frequency of the habit (e.g., daily, weekly).
+            periodicity (str): The schedule of the habit (e.g., daily, weekly, 3 per week, every 2 days,
+                               monthly on the 1st).
             id (int, optional): The database ID of the habit. Defaults to None.
             creation_date (str): The timestamp when the habit was created.
         """
@@ -20,7 +25,7 @@ class Habit:
                Parameters:
                    name (str): The name of the habit.
                    description (str): A brief description of the habit.
-                   periodicity (str): Daily or weekly habit.
+                   periodicity (str): The schedule of the habit, e.g. daily, weekly or 3 per week.
                    id (int, optional): The database ID of the habit. Defaults to None.
                """
         self.name = name
@@ -30,31 +35,34 @@ class Habit:
         self.creation_date = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
 
 
+    @instrument
     def save_to_db(self, db):
         """
                 Save the habit to the database.
 
                 Parameter:
-                    db: The database connection object.
+                    db: The storage backend or database connection object.
 
                 Returns:
                     int: The ID of the newly created habit in the database.
+
+                Raises:
+                    ValueError: If the periodicity is not a valid schedule.
                 """
-        cursor = db.cursor()
-        cursor.execute('''INSERT INTO habits (name, description, periodicity, creation_date)
-                        VALUES (?, ?, ?, ?)''', (self.name, self.description, self.periodicity, self.creation_date))
-        db.commit()
-        self.id = cursor.lastrowid
+        self.periodicity = normalize_schedule(self.periodicity)
+        self.id = get_backend(db).add_habit(self.name, self.description, self.periodicity, self.creation_date)
         return self.id
 
 
+    @instrument
     def increment(self, db, increment_date=None):
         """
               Increment the habit counter.
 
               Parameters:
-                  db: The database connection object.
-                  increment_date (datetime, optional): The date and time of the increment.
+                  db: The storage backend or database connection object.
+                  increment_date (datetime, optional): The date and time of the increment, in the
+                                                       user's timezone if it is naive.
                                                        Defaults to the current time.
 
               Raises:
@@ -62,55 +70,52 @@ class Habit:
               """
         if self.id is None:
             raise ValueError("Habit must be saved to the database before incrementing.")
-        current_time = increment_date.strftime("%d/%m/%Y %H:%M:%S") if increment_date else datetime.now().strftime(
-            "%d/%m/%Y %H:%M:%S")
-        cursor = db.cursor()
-        cursor.execute('''INSERT INTO counters (habit_id, increment_date) VALUES (?, ?)''', (self.id, current_time))
-        db.commit()
+        backend = get_backend(db)
+        calendar = calendar_for(backend.timezone())
+        timestamp = calendar.timestamp(increment_date)
+        backend.add_check_in(self.id, calendar.format(timestamp), timestamp)
 
 
+    @instrument
     def reset(self, db):
         """
                 Reset the habit's counter.
 
                 Parameters:
-                    db: The database connection object.
+                    db: The storage backend or database connection object.
 
                 Raises:
                     ValueError: If the habit has not been saved to the database.
                 """
         if self.id is None:
             raise ValueError("Habit must be saved to the database before resetting.")
-        cursor = db.cursor()
-        cursor.execute('''DELETE FROM counters WHERE habit_id = ?''', (self.id,))
-        db.commit()
+        get_backend(db).delete_check_ins(self.id)
 
 
+    @instrument
     def delete(self, db):
         """
                 Delete the habit and its associated counters from the database.
 
                 Parameter:
-                    db: The database connection object.
+                    db: The storage backend or database connection object.
 
                 Raises:
                     ValueError: If the habit has not been saved to the database.
                 """
         if self.id is None:
             raise ValueError("Habit must be saved to the database before deleting.")
-        cursor = db.cursor()
-        cursor.execute('''DELETE FROM habits WHERE id = ?''', (self.id,))
-        cursor.execute('''DELETE FROM counters WHERE habit_id = ?''', (self.id,))
-        db.commit()
+        get_backend(db).delete_habit(self.id)
 
 
     @classmethod
+    @instrument
     def get_by_name(cls, db, name):
         """
         Retrieve a habit from the database by its name.
 
         Parameters:
-            db: The database connection object.
+            db: The storage backend or database connection object.
             name (str): The name of the habit to retrieve.
 
         Returns:
@@ -119,9 +124,7 @@ class Habit:
         Raises:
             ValueError: If the habit does not exist.
         """
-        cursor = db.cursor()
-        cursor.execute('SELECT id, name, description, periodicity FROM habits WHERE name = ?', (name,))
-        row = cursor.fetchone()
+        row = get_backend(db).get_habit(name)
 
         if row is None:
             raise ValueError(f"Habit with name '{name}' not found.")
@@ -1,26 +1,30 @@
+import argparse
 import questionary
-from datetime import datetime
-from db import get_habits_list, get_habits_by_periodicity, initialize_database, get_db
-from habit import Habit
-from analyse import get_longest_streak, get_longest_streak_all_habits
+from db import get_db
+from durability import DURABILITY_PROFILES, DEFAULT_DURABILITY
+from store import HabitStore
+from analyse import get_longest_streak, get_longest_streak_all_habits, get_dashboard
+from report import get_activity, render_report, render_habit, export_html, export_svg
 from db_example_db import preload_example_data
-import sqlite3
+import profiling
+from storage import get_backend
+from schedule import compile_schedule
+from timezones import calendar_for
+from prompt_toolkit.completion import Completer, Completion
 
+# Number of suggestions shown while typing a habit name.
+COMPLETION_PAGE_SIZE = 20
 
 
 def is_database_empty(db):
     """
     Check if the database is empty by verifying if any habits exist.
     """
-    cursor = db.cursor()
-    cursor.execute("SELECT COUNT(*) FROM habits")
-    result = cursor.fetchone()
-    return result[0] == 0  # Returns True if there are no habits
+    return get_backend(db).count_habits() == 0  # Returns True if there are no habits
 
 
-def main():
-    db = get_db()
-    initialize_database(db)
+def main(durability=DEFAULT_DURABILITY):
+    db = get_db(durability=durability)
 
     # Check if the database is empty
     if is_database_empty(db):
@@ -35,10 +39,10 @@ def main():
             print("\nStarting with an empty database.")
 
     print("Welcome to the Habit Tracker App!")
-    main_menu(db)
+    main_menu(HabitStore(db))
 
 
-def main_menu(db):
+def main_menu(store):
     while True:
         choice = questionary.select(
             "Choose an action:",
@@ -50,15 +54,15 @@ def main_menu(db):
         ).ask()
 
         if choice == "Manage habits":
-            manage_habits_menu(db)
+            manage_habits_menu(store)
         elif choice == "Analyse habits":
-            analyse_habits_menu(db)
+            analyse_habits_menu(store)
         elif choice == "Exit":
             print("Thank you for using Habits! Goodbye!")
             break
 
 
-def manage_habits_menu(db):
+def manage_habits_menu(store):
     while True:
         choice = questionary.select(
             "Habit Management Options",
@@ -69,47 +73,65 @@ def manage_habits_menu(db):
                 "Check off habit",
                 "Reset habit",
                 "Delete habit",
+                "Set timezone",
                 "Back to Main Menu",
             ],
         ).ask()
 
         if choice == "View all habits":
-            view_all_habits(db)
+            view_all_habits(store)
         elif choice == "View habits by periodicity":
-            habits_by_periodicity(db)
+            habits_by_periodicity(store)
         elif choice == "Add a new habit":
-            add_habit(db)
+            add_habit(store)
         elif choice == "Check off habit":
-            increment_habit(db)
+            increment_habit(store)
         elif choice == "Reset habit":
-            reset_habit(db)
+            reset_habit(store)
         elif choice == "Delete habit":
-            delete_habit(db)
+            delete_habit(store)
+        elif choice == "Set timezone":
+            set_timezone(store)
         elif choice == "Back to Main Menu":
             break
 
 
-def analyse_habits_menu(db):
+def analyse_habits_menu(store):
     while True:
         choice = questionary.select(
             "Habit Analyse Options:",
             choices=[
                 "Get longest streak (specific habit)",
                 "Get longest streak (all habits)",
+                "View dashboard",
+                "View habits at risk",
+                "View activity report",
+                "View habit heatmap",
+                "Export activity report",
                 "Back to Main Menu",
             ],
         ).ask()
 
         if choice == "Get longest streak (specific habit)":
-            longest_streak_specific(db)
+            longest_streak_specific(store)
         elif choice == "Get longest streak (all habits)":
-            longest_streak_all(db)
+            longest_streak_all(store)
+        elif choice == "View dashboard":
+            view_dashboard(store)
+        elif choice == "View habits at risk":
+            view_at_risk(store)
+        elif choice == "View activity report":
+            view_report(store)
+        elif choice == "View habit heatmap":
+            view_habit_heatmap(store)
+        elif choice == "Export activity report":
+            export_report(store)
         elif choice == "Back to Main Menu":
             break
 
 
-def view_all_habits(db):
-    habits = get_habits_list(db)
+def view_all_habits(store):
+    habits = store.names()
     if habits:
         print("\nYour current habits are:")
         for habit in habits:
@@ -118,14 +140,23 @@ def view_all_habits(db):
         print("\nThere are no habits found")
 
 
-def habits_by_periodicity(db):
+def habits_by_periodicity(store):
     periodicity = questionary.select(
         "Select periodicity to filter habits:",
-        choices=["daily", "weekly"],
+        choices=["daily", "weekly", "custom..."],
     ).ask()
+    if periodicity == "custom...":
+        periodicity = questionary.text(
+            "Enter the schedule (e.g. 3 per week, every 2 days, monthly on the 1st):",
+            validate=valid_schedule,
+        ).ask()
+    if not periodicity:
+        print("\nReturning to Habit Management Options...")
+        return
 
     try:
-        habits = get_habits_by_periodicity(db, periodicity)
+        periodicity = compile_schedule(periodicity).text
+        habits = store.names(periodicity)
         if habits:
             print(f"\nHabits with {periodicity} periodicity:")
             for habit in habits:
@@ -136,73 +167,101 @@ def habits_by_periodicity(db):
         print(f"\nError: {e}")
 
 
-def add_habit(db):
+def valid_schedule(text):
+    try:
+        compile_schedule(text)
+        return True
+    except ValueError as e:
+        return str(e)
+
+
+def add_habit(store):
     name = questionary.text("Enter the name of the habit:").ask()
     description = questionary.text("Enter a brief description of the habit:").ask()
     periodicity = questionary.select(
         "Select the periodicity of the habit:",
-        choices=["daily", "weekly"]
+        choices=["daily", "weekly", "custom..."]
     ).ask()
+    if periodicity == "custom...":
+        periodicity = questionary.text(
+            "Enter the schedule (e.g. 3 per week, every 2 days, monthly on the 1st):",
+            validate=valid_schedule,
+        ).ask()
 
-    new_habit = Habit(name=name, description=description, periodicity=periodicity)
     try:
-        new_habit.save_to_db(db)
+        store.add_habit(name, description, periodicity)
         print(f"\nHabit '{name}' has been saved successfully.")
     except Exception as e:
         print(f"\nError: {e}")
 
 
-def increment_habit(db):
-    habits = get_habits_list(db)
-    if not habits:
+class HabitCompleter(Completer):
+    """
+    Suggest habit names from the store's search index while the user types.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        for name in self.store.search(text, limit=COMPLETION_PAGE_SIZE):
+            yield Completion(name, start_position=-len(text))
+
+
+def select_habit(store, message, cancel=True):
+    """
+    Let the user choose a habit, from a list for small catalogs and with type-ahead search for large ones.
+    Returns the name of the habit, or None if there are no habits or the user cancelled.
+    """
+    names = store.menu_names()
+    if names == []:
         print("\nThere are no habits found")
-        return
+        return None
+
+    if names is not None:
+        choices = names + (["Cancel..."] if cancel else [])
+        habit_name = questionary.select(message, choices=choices).ask()
+        return None if habit_name == "Cancel..." else habit_name
+
+    def validate(text):
+        if (cancel and not text) or text in store.index():
+            return True
+        return "Unknown habit, keep typing to see suggestions"
 
-    choices = habits + ["Cancel..."]
-    habit_name = questionary.select("Select a habit to check off:", choices=choices).ask()
+    hint = " (type to search, leave empty to cancel)" if cancel else " (type to search)"
+    habit_name = questionary.autocomplete(message + hint, choices=[], completer=HabitCompleter(store),
+                                          validate=validate).ask()
+    return habit_name or None
 
-    if habit_name == "Cancel...":
+
+def increment_habit(store):
+    habit_name = select_habit(store, "Select a habit to check off:")
+    if habit_name is None:
         print("\nReturning to Habit Management Options...")
         return
     try:
-        habit = Habit.get_by_name(db, habit_name)
-        increment_date = datetime.now()
-        habit.increment(db, increment_date)
+        store.check_in(habit_name)
         print(f"\nHabit '{habit_name}' has been checked off successfully.")
     except Exception as e:
         print(f"\nError: {e}")
 
 
-def reset_habit(db):
-    habits = get_habits_list(db)
-    if not habits:
-        print("\nThere are no habits found")
-        return
-
-    choices = habits + ["Cancel..."]
-    habit_name = questionary.select("Select a habit to check off:", choices=choices).ask()
-
-    if habit_name == "Cancel...":
+def reset_habit(store):
+    habit_name = select_habit(store, "Select a habit to check off:")
+    if habit_name is None:
         print("\nReturning to Habit Management Options...")
         return
     try:
-        habit = Habit.get_by_name(db, habit_name)
-        habit.reset(db)
+        store.reset(habit_name)
         print(f"\nHabit '{habit_name}' has been reset successfully.")
     except Exception as e:
         print(f"\nError: {e}")
 
 
-def delete_habit(db):
-    habits = get_habits_list(db)
-    if not habits:
-        print("\nNo habits found.")
-        return
-
-    choices = habits + ["Cancel..."]
-    habit_name = questionary.select("Select a habit to check off:", choices=choices).ask()
-
-    if habit_name == "Cancel...":
+def delete_habit(store):
+    habit_name = select_habit(store, "Select a habit to check off:")
+    if habit_name is None:
         print("\nReturning to Habit Management Options...")
         return
 
@@ -211,8 +270,7 @@ def delete_habit(db):
 
     if confirm:
         try:
-            habit = Habit.get_by_name(db, habit_name)
-            habit.delete(db)
+            store.delete(habit_name)
             print(f"\nHabit '{habit_name}' has been deleted successfully.")
         except Exception as e:
             print(f"\nError: {e}")
@@ -220,27 +278,148 @@ def delete_habit(db):
         print("\nDeleting habits cancelled.")
 
 
-def longest_streak_specific(db):
-    habits = get_habits_list(db)
-    if not habits:
-        print("\nNo habits found.")
+def valid_timezone(text):
+    if not text:
+        return True
+    try:
+        calendar_for(text)
+        return True
+    except ValueError as e:
+        return str(e)
+
+
+def set_timezone(store):
+    name = questionary.text(
+        f"Enter your timezone (currently {store.calendar.name}, e.g. Europe/Budapest):",
+        validate=valid_timezone,
+    ).ask()
+    if not name:
+        print("\nReturning to Habit Management Options...")
         return
+    try:
+        store.set_timezone(name)
+        print(f"\nCheck-ins are now counted in the {name} timezone.")
+    except Exception as e:
+        print(f"\nError: {e}")
+
 
-    habit_name = questionary.select("Select a habit:", choices=habits).ask()
+def longest_streak_specific(store):
+    habit_name = select_habit(store, "Select a habit:", cancel=False)
+    if habit_name is None:
+        print("\nReturning to Habit Analyse Options...")
+        return
     try:
-        streak = get_longest_streak(db, habit_name)
+        streak = get_longest_streak(store.db, habit_name)
         print(f"\nThe longest streak for '{habit_name}' is {streak} days.")
     except Exception as e:
         print(f"\nError: {e}")
 
 
-def longest_streak_all(db):
+def longest_streak_all(store):
     try:
-        streak = get_longest_streak_all_habits(db)
+        streak = get_longest_streak_all_habits(store.db)
         print(f"\nThe longest streak for all habits is {streak} days.")
     except Exception as e:
         print(f"\nError: {e}")
 
 
+def view_dashboard(store):
+    try:
+        dashboard = get_dashboard(store.db)
+    except Exception as e:
+        print(f"\nError: {e}")
+        return
+    if not dashboard:
+        print("\nNo habits found.")
+        return
+
+    print(f"\n{'Habit':30} {'Count':>6} {'Current':>8} {'Longest':>8} {'Rate':>6}  Last check-in")
+    for entry in dashboard:
+        last_check_in = entry["last_check_in"].strftime("%d/%m/%Y %H:%M") if entry["last_check_in"] else "-"
+        print(f"{entry['name'][:30]:30} {entry['count']:6d} {entry['current_streak']:8d} "
+              f"{entry['longest_streak']:8d} {entry['completion_rate']:6.0%}  {last_check_in}")
+
+
+def view_at_risk(store):
+    try:
+        at_risk = store.at_risk()
+    except Exception as e:
+        print(f"\nError: {e}")
+        return
+    if not at_risk:
+        print("\nNo habits are at risk today.")
+        return
+
+    print("\nHabits likely to break their streak today:")
+    for name, score in at_risk:
+        status = "streak broken" if score >= 1 else f"{score:.0%} risk"
+        print(f"- {name} ({status})")
+
+
+def view_report(store):
+    try:
+        print("\n" + render_report(get_activity(store.db)))
+    except Exception as e:
+        print(f"\nError: {e}")
+
+
+def view_habit_heatmap(store):
+    habit_name = select_habit(store, "Select a habit:", cancel=False)
+    if habit_name is None:
+        print("\nReturning to Habit Analyse Options...")
+        return
+    try:
+        print("\n" + render_habit(get_activity(store.db), habit_name))
+    except Exception as e:
+        print(f"\nError: {e}")
+
+
+def export_report(store):
+    path = questionary.text("Save the report as (.html, or .svg for the heatmap only):",
+                            default="habit_report.html").ask()
+    if not path:
+        print("\nReturning to Habit Analyse Options...")
+        return
+    try:
+        activity = get_activity(store.db)
+        if path.lower().endswith(".svg"):
+            export_svg(activity, path)
+        else:
+            export_html(activity, path)
+        print(f"\nThe report has been saved to '{path}'.")
+    except Exception as e:
+        print(f"\nError: {e}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Habit Tracker App")
+    parser.add_argument("--profile", action="store_true",
+                        help="enable instrumentation and print a cProfile report at exit")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="with --profile, write the collected metrics to PATH "
+                             "(Prometheus text format if PATH ends in .prom, JSON otherwise)")
+    parser.add_argument("--durability", choices=list(DURABILITY_PROFILES), default=DEFAULT_DURABILITY,
+                        help="how check-ins are made durable: strict flushes every commit to disk, "
+                             "normal and relaxed trade the latest commits on a power loss for speed")
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    if not args.profile:
+        main(args.durability)
+        return
+
+    profiling.enable()
+    try:
+        profiling.run_profiled(main, args.durability)
+    finally:
+        if args.metrics:
+            export = profiling.export_prometheus if args.metrics.endswith(".prom") else profiling.export_json
+            with open(args.metrics, "w") as f:
+                f.write(export())
+            print(f"Metrics written to {args.metrics}")
+
+
 if __name__ == "__main__":
-    main()
+    run()
@@ -0,0 +1,230 @@
+import cProfile
+import json
+import pstats
+import time
+from functools import wraps
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, float("inf"))
+
+# Number of SQLite virtual machine instructions between two progress callbacks.
+PROGRESS_STEPS = 100
+
+_enabled = False
+_calls = {}
+_statements = {}
+_current_statement = None
+
+
+def enable():
+    """
+    Turn the instrumentation layer on. Until this is called every instrumented
+    function runs with only a single flag check of overhead.
+    """
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """
+    Turn the instrumentation layer off. Metrics collected so far are kept.
+    """
+    global _enabled
+    _finish_statement()
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """
+    Discard all collected metrics.
+    """
+    global _current_statement
+    _calls.clear()
+    _statements.clear()
+    _current_statement = None
+
+
+def _new_metric():
+    return {"calls": 0, "total_seconds": 0.0, "buckets": [0] * len(LATENCY_BUCKETS)}
+
+
+def _observe(metric, elapsed):
+    metric["calls"] += 1
+    metric["total_seconds"] += elapsed
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if elapsed <= bound:
+            metric["buckets"][i] += 1
+            break
+
+
+def instrument(func):
+    """
+    Decorator recording call counts and a latency histogram for `func` while
+    the instrumentation layer is enabled.
+
+    Parameters:
+    ----------
+    func : callable
+        The function to wrap.
+
+    Returns:
+    -------
+    callable
+        The wrapped function.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _finish_statement()
+            metric = _calls.get(name)
+            if metric is None:
+                metric = _calls[name] = _new_metric()
+            _observe(metric, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _finish_statement():
+    """
+    Close the timing of the statement that is currently being traced.
+    """
+    global _current_statement
+    if _current_statement is None:
+        return
+    sql, start, steps = _current_statement
+    _current_statement = None
+    metric = _statements.get(sql)
+    if metric is None:
+        metric = _statements[sql] = _new_metric()
+        metric["vm_steps"] = 0
+    metric["vm_steps"] += steps
+    _observe(metric, time.perf_counter() - start)
+
+
+def _on_statement(sql):
+    global _current_statement
+    if not _enabled:
+        return
+    _finish_statement()
+    _current_statement = (" ".join(sql.split()), time.perf_counter(), 0)
+
+
+def _on_progress():
+    global _current_statement
+    if _current_statement is not None:
+        sql, start, steps = _current_statement
+        _current_statement = (sql, start, steps + PROGRESS_STEPS)
+    return 0
+
+
+def instrument_connection(db):
+    """
+    Attach SQLite trace and progress callbacks to a connection so every statement
+    it runs is counted and timed. A statement is timed from its start until the
+    next statement starts or the enclosing instrumented call returns, and the
+    number of virtual machine steps it took is used as a measure of rows scanned.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+
+    Returns:
+    -------
+    sqlite3.Connection
+        The same connection, for chaining.
+    """
+    db.set_trace_callback(_on_statement)
+    db.set_progress_handler(_on_progress, PROGRESS_STEPS)
+    return db
+
+
+def snapshot():
+    """
+    Return a copy of all metrics collected so far.
+
+    Returns:
+    -------
+    dict
+        A dictionary with the keys "functions" and "statements".
+    """
+    _finish_statement()
+    return {
+        "buckets": [str(bound) for bound in LATENCY_BUCKETS],
+        "functions": {name: dict(metric, buckets=list(metric["buckets"])) for name, metric in _calls.items()},
+        "statements": {sql: dict(metric, buckets=list(metric["buckets"])) for sql, metric in _statements.items()},
+    }
+
+
+def export_json():
+    """
+    Export the collected metrics as a JSON document.
+    """
+    return json.dumps(snapshot(), indent=2)
+
+
+def _prometheus_histogram(lines, metric_name, label_name, label_value, metric):
+    label_value = label_value.replace("\\", "\\\\").replace('"', '\\"')
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, metric["buckets"]):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f'{metric_name}_bucket{{{label_name}="{label_value}",le="{le}"}} {cumulative}')
+    lines.append(f'{metric_name}_sum{{{label_name}="{label_value}"}} {metric["total_seconds"]}')
+    lines.append(f'{metric_name}_count{{{label_name}="{label_value}"}} {metric["calls"]}')
+
+
+def export_prometheus():
+    """
+    Export the collected metrics in the Prometheus text exposition format.
+    """
+    data = snapshot()
+    lines = [
+        "# HELP habit_call_seconds Latency of instrumented habit tracker functions.",
+        "# TYPE habit_call_seconds histogram",
+    ]
+    for name, metric in data["functions"].items():
+        _prometheus_histogram(lines, "habit_call_seconds", "function", name, metric)
+
+    lines.append("# HELP habit_statement_seconds Latency of SQLite statements.")
+    lines.append("# TYPE habit_statement_seconds histogram")
+    for sql, metric in data["statements"].items():
+        _prometheus_histogram(lines, "habit_statement_seconds", "statement", sql, metric)
+
+    lines.append("# HELP habit_statement_vm_steps_total SQLite virtual machine steps per statement.")
+    lines.append("# TYPE habit_statement_vm_steps_total counter")
+    for sql, metric in data["statements"].items():
+        label = sql.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'habit_statement_vm_steps_total{{statement="{label}"}} {metric["vm_steps"]}')
+    return "\n".join(lines) + "\n"
+
+
+def run_profiled(func, *args, sort="cumulative", limit=30, **kwargs):
+    """
+    Run `func` under cProfile and print a report once it returns, even if it raised.
+
+    Parameters:
+    ----------
+    func : callable
+        The function to profile.
+    sort : str
+        The pstats sort key of the report.
+    limit : int
+        The number of rows printed in the report.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        pstats.Stats(profiler).sort_stats(sort).print_stats(limit)
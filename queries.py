@@ -0,0 +1,455 @@
+# All SQL statements used by the application live in this module, so that every
+# query can be found in one place and checked by the query plan tests.
+
+# --- Schema -------------------------------------------------------------------
+
+CREATE_HABITS_TABLE = '''CREATE TABLE IF NOT EXISTS habits (
+                            id INTEGER PRIMARY KEY,
+                            name TEXT UNIQUE NOT NULL,
+                            description TEXT,
+                            periodicity TEXT NOT NULL,
+                            creation_date TEXT
+                        )'''
+
+CREATE_COUNTERS_TABLE = '''CREATE TABLE IF NOT EXISTS counters (
+                              id INTEGER PRIMARY KEY,
+                              habit_id INTEGER NOT NULL,
+                              increment_date TEXT NOT NULL,
+                              FOREIGN KEY (habit_id) REFERENCES habits (id)
+                          )'''
+
+CREATE_COUNTERS_HABIT_INDEX = '''CREATE INDEX IF NOT EXISTS idx_counters_habit_id
+                                 ON counters (habit_id, increment_date)'''
+
+CREATE_HABITS_PERIODICITY_INDEX = '''CREATE INDEX IF NOT EXISTS idx_habits_periodicity
+                                     ON habits (periodicity, name)'''
+
+SCHEMA = (
+    CREATE_HABITS_TABLE,
+    CREATE_COUNTERS_TABLE,
+    CREATE_COUNTERS_HABIT_INDEX,
+    CREATE_HABITS_PERIODICITY_INDEX,
+)
+
+# --- Change log ---------------------------------------------------------------
+
+# Number of most recent changes kept in the change log.
+CHANGE_LOG_RETENTION = 100000
+
+# AUTOINCREMENT guarantees that sequence numbers are never reused, even after pruning.
+CREATE_CHANGES_TABLE = '''CREATE TABLE IF NOT EXISTS changes (
+                             seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                             operation TEXT NOT NULL,
+                             habit_id INTEGER NOT NULL,
+                             habit_name TEXT,
+                             counter_id INTEGER,
+                             increment_date TEXT
+                         )'''
+
+CREATE_HABIT_ADDED_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS log_habit_added AFTER INSERT ON habits
+                                BEGIN
+                                    INSERT INTO changes (operation, habit_id, habit_name)
+                                    VALUES ('habit_added', NEW.id, NEW.name);
+                                END'''
+
+CREATE_HABIT_DELETED_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS log_habit_deleted AFTER DELETE ON habits
+                                  BEGIN
+                                      INSERT INTO changes (operation, habit_id, habit_name)
+                                      VALUES ('habit_deleted', OLD.id, OLD.name);
+                                  END'''
+
+CREATE_CHECK_IN_ADDED_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS log_check_in_added AFTER INSERT ON counters
+                                   BEGIN
+                                       INSERT INTO changes (operation, habit_id, habit_name, counter_id, increment_date)
+                                       VALUES ('check_in_added', NEW.habit_id,
+                                               (SELECT name FROM habits WHERE id = NEW.habit_id),
+                                               NEW.id, NEW.increment_date);
+                                   END'''
+
+CREATE_CHECK_IN_REMOVED_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS log_check_in_removed AFTER DELETE ON counters
+                                     BEGIN
+                                         INSERT INTO changes (operation, habit_id, habit_name, counter_id, increment_date)
+                                         VALUES ('check_in_removed', OLD.habit_id,
+                                                 (SELECT name FROM habits WHERE id = OLD.habit_id),
+                                                 OLD.id, OLD.increment_date);
+                                     END'''
+
+# Every insert into the log drops the change that fell out of the retention window,
+# which is a primary key lookup and keeps the log size bounded.
+CREATE_CHANGES_RETENTION_TRIGGER = f'''CREATE TRIGGER IF NOT EXISTS prune_changes AFTER INSERT ON changes
+                                      BEGIN
+                                          DELETE FROM changes WHERE seq <= NEW.seq - {CHANGE_LOG_RETENTION};
+                                      END'''
+
+CHANGE_LOG_SCHEMA = (
+    CREATE_CHANGES_TABLE,
+    CREATE_HABIT_ADDED_TRIGGER,
+    CREATE_HABIT_DELETED_TRIGGER,
+    CREATE_CHECK_IN_ADDED_TRIGGER,
+    CREATE_CHECK_IN_REMOVED_TRIGGER,
+    CREATE_CHANGES_RETENTION_TRIGGER,
+)
+
+# --- Sync ---------------------------------------------------------------------
+
+# Settings of this database file, such as the ID that identifies it to sync peers.
+CREATE_META_TABLE = '''CREATE TABLE IF NOT EXISTS meta (
+                          key TEXT PRIMARY KEY,
+                          value TEXT
+                      )'''
+
+MIGRATE_ASSIGN_DEVICE_ID = "INSERT OR IGNORE INTO meta (key, value) VALUES ('device_id', lower(hex(randomblob(16))))"
+
+# Every check-in gets a stable random ID and the ID of the device it was made on.
+MIGRATE_ADD_COUNTERS_UID = 'ALTER TABLE counters ADD COLUMN uid TEXT'
+
+MIGRATE_ADD_COUNTERS_ORIGIN = 'ALTER TABLE counters ADD COLUMN origin TEXT'
+
+MIGRATE_BACKFILL_COUNTERS_UID = '''UPDATE counters
+                                   SET uid = lower(hex(randomblob(16))),
+                                       origin = (SELECT value FROM meta WHERE key = 'device_id')
+                                   WHERE uid IS NULL'''
+
+CREATE_COUNTERS_UID_INDEX = 'CREATE UNIQUE INDEX IF NOT EXISTS idx_counters_uid ON counters (uid)'
+
+# Check-ins inserted without an ID are made on this device.
+CREATE_ASSIGN_UID_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS assign_check_in_uid AFTER INSERT ON counters
+                               WHEN NEW.uid IS NULL
+                               BEGIN
+                                   UPDATE counters
+                                   SET uid = lower(hex(randomblob(16))),
+                                       origin = (SELECT value FROM meta WHERE key = 'device_id')
+                                   WHERE id = NEW.id;
+                               END'''
+
+# Tombstones of removed check-ins, so a removal wins over the check-in arriving again from a peer.
+CREATE_REMOVED_CHECK_INS_TABLE = '''CREATE TABLE IF NOT EXISTS removed_check_ins (
+                                       uid TEXT PRIMARY KEY,
+                                       removed_at TEXT NOT NULL
+                                   ) WITHOUT ROWID'''
+
+CREATE_RECORD_REMOVAL_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS record_removed_check_in AFTER DELETE ON counters
+                                   WHEN OLD.uid IS NOT NULL
+                                   BEGIN
+                                       INSERT OR IGNORE INTO removed_check_ins (uid, removed_at)
+                                       VALUES (OLD.uid, strftime('%d/%m/%Y %H:%M:%S', 'now', 'localtime'));
+                                   END'''
+
+# The change log keeps the ID of removed check-ins, which are gone from `counters` when it is read.
+MIGRATE_ADD_CHANGES_UID = 'ALTER TABLE changes ADD COLUMN uid TEXT'
+
+MIGRATE_DROP_CHECK_IN_REMOVED_TRIGGER = 'DROP TRIGGER IF EXISTS log_check_in_removed'
+
+CREATE_CHECK_IN_REMOVED_UID_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS log_check_in_removed AFTER DELETE ON counters
+                                         BEGIN
+                                             INSERT INTO changes (operation, habit_id, habit_name, counter_id,
+                                                                  increment_date, uid)
+                                             VALUES ('check_in_removed', OLD.habit_id,
+                                                     (SELECT name FROM habits WHERE id = OLD.habit_id),
+                                                     OLD.id, OLD.increment_date, OLD.uid);
+                                         END'''
+
+# The sync vector: the last change log sequence number applied from every peer.
+CREATE_SYNC_PEERS_TABLE = '''CREATE TABLE IF NOT EXISTS sync_peers (
+                                device_id TEXT PRIMARY KEY,
+                                last_seq INTEGER NOT NULL
+                            )'''
+
+SYNC_SCHEMA = (
+    CREATE_META_TABLE,
+    MIGRATE_ASSIGN_DEVICE_ID,
+    MIGRATE_ADD_COUNTERS_UID,
+    MIGRATE_ADD_COUNTERS_ORIGIN,
+    MIGRATE_BACKFILL_COUNTERS_UID,
+    CREATE_COUNTERS_UID_INDEX,
+    CREATE_ASSIGN_UID_TRIGGER,
+    CREATE_REMOVED_CHECK_INS_TABLE,
+    CREATE_RECORD_REMOVAL_TRIGGER,
+    MIGRATE_ADD_CHANGES_UID,
+    MIGRATE_DROP_CHECK_IN_REMOVED_TRIGGER,
+    CREATE_CHECK_IN_REMOVED_UID_TRIGGER,
+    CREATE_SYNC_PEERS_TABLE,
+)
+
+# --- Timestamps ---------------------------------------------------------------
+
+# Check-ins keep their moment as a UTC epoch timestamp next to the local date string, and the
+# timezone their local days are counted in is a setting of the database file.
+MIGRATE_ADD_COUNTERS_TIMESTAMP = 'ALTER TABLE counters ADD COLUMN increment_ts INTEGER'
+
+MIGRATE_DEFAULT_TIMEZONE = "INSERT OR IGNORE INTO meta (key, value) VALUES ('timezone', ?)"
+
+SELECT_TIMEZONE = "SELECT value FROM meta WHERE key = 'timezone'"
+
+UPSERT_TIMEZONE = '''INSERT INTO meta (key, value) VALUES ('timezone', ?)
+                     ON CONFLICT (key) DO UPDATE SET value = excluded.value'''
+
+# Check-ins written without a timestamp, whose date string is still in local time.
+SELECT_UNTIMED_CHECK_INS = 'SELECT id, increment_date FROM counters WHERE increment_ts IS NULL'
+
+UPDATE_CHECK_IN_TIMESTAMP = 'UPDATE counters SET increment_ts = ? WHERE id = ?'
+
+SELECT_TIMED_CHECK_INS = 'SELECT id, increment_ts FROM counters WHERE increment_ts IS NOT NULL'
+
+# Date strings are rewritten in the new timezone when it changes.
+UPDATE_CHECK_IN_DATE = 'UPDATE counters SET increment_date = ? WHERE id = ?'
+
+# --- Reports ------------------------------------------------------------------
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def _local_day(column):
+    """
+    Return the SQL expression for the day ordinal (as `date.toordinal()`) of a "dd/mm/YYYY HH:MM:SS"
+    column, which is NULL if the column does not hold a date.
+    """
+    return (f"CAST(julianday(substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' "
+            f"|| substr({column}, 1, 2)) - 1721424.5 AS INTEGER)")
+
+
+def _count_check_in(row):
+    """
+    Return the statement that adds a check-in (NEW or OLD in a trigger) to the weekly counts.
+    """
+    return f'''INSERT INTO weekly_counts (habit_id, week, {", ".join(_WEEKDAYS)})
+               SELECT {row}.habit_id, (day - 1) / 7, {", ".join(f"(day - 1) % 7 = {i}" for i in range(7))}
+               FROM (SELECT {_local_day(row + ".increment_date")} AS day)
+               WHERE day IS NOT NULL
+               ON CONFLICT (habit_id, week) DO UPDATE
+               SET {", ".join(f"{name} = {name} + excluded.{name}" for name in _WEEKDAYS)};'''
+
+
+def _uncount_check_in(row):
+    """
+    Return the statements that take a check-in (NEW or OLD in a trigger) off the weekly counts.
+    The day is spelled out in every expression, as UPDATE ... FROM needs SQLite 3.33.
+    """
+    day = _local_day(row + ".increment_date")
+    return f'''UPDATE weekly_counts
+               SET {", ".join(f"{name} = {name} - (({day} - 1) % 7 = {i})" for i, name in enumerate(_WEEKDAYS))}
+               WHERE habit_id = {row}.habit_id AND week = ({day} - 1) / 7;
+               DELETE FROM weekly_counts
+               WHERE habit_id = {row}.habit_id AND week = ({day} - 1) / 7
+                     AND {" + ".join(_WEEKDAYS)} = 0;'''
+
+
+# The number of check-ins of every habit per local day, one row per habit and week from Monday to
+# Sunday, which is one column of a calendar heatmap. Triggers on `counters` keep it current, so
+# reports read a few rows per habit instead of every check-in.
+CREATE_WEEKLY_COUNTS_TABLE = f'''CREATE TABLE IF NOT EXISTS weekly_counts (
+                                   habit_id INTEGER NOT NULL,
+                                   week INTEGER NOT NULL,
+                                   {" ".join(f"{name} INTEGER NOT NULL DEFAULT 0," for name in _WEEKDAYS)}
+                                   PRIMARY KEY (habit_id, week)
+                               ) WITHOUT ROWID'''
+
+CREATE_COUNT_CHECK_IN_ADDED_TRIGGER = f'''CREATE TRIGGER IF NOT EXISTS count_check_in_added AFTER INSERT ON counters
+                                          BEGIN
+                                              {_count_check_in("NEW")}
+                                          END'''
+
+CREATE_COUNT_CHECK_IN_REMOVED_TRIGGER = f'''CREATE TRIGGER IF NOT EXISTS count_check_in_removed AFTER DELETE ON counters
+                                            BEGIN
+                                                {_uncount_check_in("OLD")}
+                                            END'''
+
+CREATE_COUNT_CHECK_IN_MOVED_TRIGGER = f'''CREATE TRIGGER IF NOT EXISTS count_check_in_moved
+                                          AFTER UPDATE OF habit_id, increment_date ON counters
+                                          BEGIN
+                                              {_uncount_check_in("OLD")}
+                                              {_count_check_in("NEW")}
+                                          END'''
+
+MIGRATE_BACKFILL_WEEKLY_COUNTS = f'''INSERT INTO weekly_counts (habit_id, week, {", ".join(_WEEKDAYS)})
+                                     SELECT habit_id, (day - 1) / 7,
+                                            {", ".join(f"SUM((day - 1) % 7 = {i})" for i in range(7))}
+                                     FROM (SELECT habit_id, {_local_day("increment_date")} AS day FROM counters)
+                                     WHERE day IS NOT NULL
+                                     GROUP BY habit_id, (day - 1) / 7'''
+
+REPORT_SCHEMA = (
+    CREATE_WEEKLY_COUNTS_TABLE,
+    CREATE_COUNT_CHECK_IN_ADDED_TRIGGER,
+    CREATE_COUNT_CHECK_IN_REMOVED_TRIGGER,
+    CREATE_COUNT_CHECK_IN_MOVED_TRIGGER,
+    MIGRATE_BACKFILL_WEEKLY_COUNTS,
+)
+
+# --- Habits -------------------------------------------------------------------
+
+INSERT_HABIT = '''INSERT INTO habits (name, description, periodicity, creation_date)
+                  VALUES (?, ?, ?, ?)'''
+
+SELECT_HABIT_BY_NAME = 'SELECT id, name, description, periodicity FROM habits WHERE name = ?'
+
+SELECT_HABIT_ID_BY_NAME = 'SELECT id FROM habits WHERE name = ?'
+
+SELECT_HABIT_NAMES = 'SELECT name FROM habits'
+
+SELECT_HABIT_NAMES_AND_DESCRIPTIONS = 'SELECT name, description FROM habits'
+
+SELECT_HABIT_NAMES_BY_PERIODICITY = 'SELECT name FROM habits WHERE periodicity = ?'
+
+COUNT_HABITS = 'SELECT COUNT(*) FROM habits'
+
+DELETE_HABIT_BY_ID = 'DELETE FROM habits WHERE id = ?'
+
+DELETE_HABIT_BY_NAME = 'DELETE FROM habits WHERE name = ?'
+
+DELETE_ALL_HABITS = 'DELETE FROM habits'
+
+# --- Counters -----------------------------------------------------------------
+
+INSERT_COUNTER = 'INSERT INTO counters (habit_id, increment_date) VALUES (?, ?)'
+
+INSERT_COUNTER_AT = 'INSERT INTO counters (habit_id, increment_date, increment_ts) VALUES (?, ?, ?)'
+
+# Look up the habit and insert its check-in in a single statement.
+INSERT_COUNTER_BY_HABIT_NAME = '''INSERT INTO counters (habit_id, increment_date, increment_ts)
+                                  SELECT id, ?, ? FROM habits WHERE name = ?'''
+
+COUNT_COUNTERS_BY_HABIT_ID = 'SELECT COUNT(*) FROM counters WHERE habit_id = ?'
+
+COUNT_COUNTERS_BY_HABIT_NAME = '''SELECT COUNT(*) FROM counters
+                                  WHERE habit_id = (SELECT id FROM habits WHERE name = ?)'''
+
+DELETE_COUNTERS_BY_HABIT_ID = 'DELETE FROM counters WHERE habit_id = ?'
+
+DELETE_COUNTERS_BY_HABIT_NAME = '''DELETE FROM counters
+                                   WHERE habit_id = (SELECT id FROM habits WHERE name = ?)'''
+
+DELETE_ALL_COUNTERS = 'DELETE FROM counters'
+
+# --- Change log ---------------------------------------------------------------
+
+SELECT_CHANGES_SINCE = '''SELECT seq, operation, habit_id, habit_name, counter_id, increment_date
+                          FROM changes WHERE seq > ? ORDER BY seq LIMIT ?'''
+
+SELECT_LAST_CHANGE_SEQ = 'SELECT COALESCE(MAX(seq), 0) FROM changes'
+
+# --- Sync ---------------------------------------------------------------------
+
+SELECT_DEVICE_ID = "SELECT value FROM meta WHERE key = 'device_id'"
+
+SELECT_SYNC_PEERS = 'SELECT device_id, last_seq FROM sync_peers'
+
+UPSERT_SYNC_PEER = '''INSERT INTO sync_peers (device_id, last_seq) VALUES (?, ?)
+                      ON CONFLICT (device_id) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq)'''
+
+SELECT_FIRST_CHANGE_SEQ = 'SELECT COALESCE(MIN(seq), 0) FROM changes'
+
+# A database restored from a backup is a new device to its peers, which forget nothing they have applied.
+RESET_DEVICE_ID = "UPDATE meta SET value = lower(hex(randomblob(16))) WHERE key = 'device_id'"
+
+DELETE_SYNC_PEERS = 'DELETE FROM sync_peers'
+
+# The next sequence number of the change log, which AUTOINCREMENT keeps in `sqlite_sequence`.
+SELECT_CHANGE_SEQUENCE = "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'changes'"
+
+UPDATE_CHANGE_SEQUENCE = "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'changes'"
+
+INSERT_CHANGE_SEQUENCE = '''INSERT INTO sqlite_sequence (name, seq) SELECT 'changes', ?
+                            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'changes')'''
+
+# Changes after a sequence number with the current state of the rows they refer to.
+# Check-ins that have been removed since have no `counters` row and are skipped by the caller.
+SELECT_SYNC_CHANGES = '''SELECT changes.operation, changes.habit_name, COALESCE(changes.uid, counters.uid),
+                                counters.increment_date, counters.origin, counters.increment_ts
+                         FROM changes LEFT JOIN counters ON counters.id = changes.counter_id
+                         WHERE changes.seq > ? AND changes.seq <= ?
+                         ORDER BY changes.seq'''
+
+SELECT_HABIT_FOR_SYNC = 'SELECT name, description, periodicity, creation_date FROM habits WHERE name = ?'
+
+SELECT_ALL_HABITS_FOR_SYNC = 'SELECT name, description, periodicity, creation_date FROM habits'
+
+SELECT_ALL_CHECK_INS_FOR_SYNC = '''SELECT habits.name, counters.uid, counters.increment_date, counters.origin,
+                                          counters.increment_ts
+                                   FROM counters INNER JOIN habits ON counters.habit_id = habits.id'''
+
+SELECT_ALL_REMOVED_CHECK_INS = 'SELECT uid FROM removed_check_ins'
+
+# When both sides created a habit with the same name, both keep the smaller (description, periodicity).
+INSERT_SYNCED_HABIT = '''INSERT INTO habits (name, description, periodicity, creation_date)
+                         VALUES (?, ?, ?, ?)
+                         ON CONFLICT (name) DO UPDATE
+                         SET description = excluded.description, periodicity = excluded.periodicity
+                         WHERE (COALESCE(excluded.description, ''), excluded.periodicity)
+                               < (COALESCE(habits.description, ''), habits.periodicity)'''
+
+# Check-ins that were removed on either side are never inserted again.
+INSERT_SYNCED_CHECK_IN = '''INSERT OR IGNORE INTO counters (habit_id, increment_date, increment_ts, uid, origin)
+                            SELECT id, ?, ?, ?, ? FROM habits
+                            WHERE name = ? AND NOT EXISTS (SELECT 1 FROM removed_check_ins WHERE uid = ?)'''
+
+INSERT_REMOVED_CHECK_IN = '''INSERT OR IGNORE INTO removed_check_ins (uid, removed_at)
+                             VALUES (?, strftime('%d/%m/%Y %H:%M:%S', 'now', 'localtime'))'''
+
+DELETE_COUNTER_BY_UID = 'DELETE FROM counters WHERE uid = ?'
+
+# A deleted habit is only removed if no check-in made elsewhere in the meantime still refers to it.
+DELETE_EMPTY_HABIT_BY_NAME = '''DELETE FROM habits
+                                WHERE name = ? AND NOT EXISTS (SELECT 1 FROM counters WHERE habit_id = habits.id)'''
+
+# --- Analysis -----------------------------------------------------------------
+
+SELECT_HISTORY_BY_HABIT_NAME = '''SELECT increment_date, periodicity, increment_ts FROM counters
+                                  INNER JOIN habits ON counters.habit_id = habits.id
+                                  WHERE habits.name = ?
+                                  ORDER BY increment_date ASC'''
+
+# One row per check-in (or one row with a NULL date for habits without check-ins), grouped by habit.
+SELECT_DASHBOARD_HISTORY = '''SELECT habits.id, habits.name, habits.periodicity, habits.creation_date,
+                                     counters.increment_date, counters.increment_ts
+                              FROM habits LEFT JOIN counters ON counters.habit_id = habits.id
+                              ORDER BY habits.id'''
+
+SELECT_HISTORY_ALL = '''SELECT increment_date, periodicity, increment_ts FROM counters
+                        INNER JOIN habits ON counters.habit_id = habits.id
+                        ORDER BY increment_date ASC'''
+
+# One row per habit and week with check-ins between two week numbers (or one row with a NULL week
+# for habits without any), grouped by habit.
+SELECT_WEEKLY_COUNTS = f'''SELECT habits.id, habits.name, habits.periodicity, weekly_counts.week,
+                                 {", ".join(f"weekly_counts.{name}" for name in _WEEKDAYS)}
+                          FROM habits LEFT JOIN weekly_counts
+                               ON weekly_counts.habit_id = habits.id AND weekly_counts.week BETWEEN ? AND ?
+                          ORDER BY habits.id, weekly_counts.week'''
+
+# --- Registry -----------------------------------------------------------------
+
+# Every statement that is run against the data, by name.
+QUERIES = {
+    name: sql for name, sql in globals().items()
+    if name.isupper() and isinstance(sql, str) and not name.startswith(("CREATE_", "MIGRATE_"))
+}
+
+# Statements run on every user action. They must be answered through an index,
+# never by scanning a whole table.
+HOT_PATH = (
+    "INSERT_HABIT",
+    "SELECT_HABIT_BY_NAME",
+    "SELECT_HABIT_ID_BY_NAME",
+    "SELECT_HABIT_NAMES_BY_PERIODICITY",
+    "DELETE_HABIT_BY_ID",
+    "DELETE_HABIT_BY_NAME",
+    "INSERT_COUNTER",
+    "INSERT_COUNTER_AT",
+    "INSERT_COUNTER_BY_HABIT_NAME",
+    "COUNT_COUNTERS_BY_HABIT_ID",
+    "COUNT_COUNTERS_BY_HABIT_NAME",
+    "DELETE_COUNTERS_BY_HABIT_ID",
+    "DELETE_COUNTERS_BY_HABIT_NAME",
+    "SELECT_HISTORY_BY_HABIT_NAME",
+    "SELECT_CHANGES_SINCE",
+    "SELECT_LAST_CHANGE_SEQ",
+    "SELECT_FIRST_CHANGE_SEQ",
+    "SELECT_SYNC_CHANGES",
+    "SELECT_HABIT_FOR_SYNC",
+    "INSERT_SYNCED_CHECK_IN",
+    "DELETE_COUNTER_BY_UID",
+    "DELETE_EMPTY_HABIT_BY_NAME",
+    "SELECT_TIMEZONE",
+    "UPDATE_CHECK_IN_TIMESTAMP",
+)
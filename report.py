@@ -0,0 +1,354 @@
+import html
+import math
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+from profiling import instrument
+from schedule import habit_schedule
+from storage import get_backend
+from timezones import calendar_for
+
+# Number of weeks shown by default, about a year like a GitHub contribution calendar.
+DEFAULT_WEEKS = 53
+
+# Heatmap cells from a day without check-ins to the busiest days, in the terminal and in SVG.
+SHADES = "·░▒▓█"
+COLORS = ("#ebedf0", "#9be9a8", "#40c463", "#30a14e", "#216e39")
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+WEEKDAY_LABELS = ("Mon", "", "Wed", "", "Fri", "", "")
+
+_NO_CHECK_INS = (0,) * 7
+
+# Size of a heatmap cell in SVG, in pixels, and the gap between cells.
+CELL_SIZE = 10
+CELL_GAP = 2
+
+
+@instrument
+def get_activity(db, weeks=DEFAULT_WEEKS, today=None):
+    """
+    Read the number of check-ins per day of every habit for a report with a single query.
+    The counts are kept per habit and local day as check-ins are written, so the query
+    returns at most one row per habit and week however many check-ins there are.
+
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        The storage backend or database connection object.
+    weeks : int
+        The number of calendar weeks, from Monday to Sunday, to report on.
+    today : date, optional
+        The last day of the report. Defaults to today in the user's timezone.
+
+    Returns:
+    -------
+    dict
+        The report data: first_day and today as day ordinals, and habits, a list with one
+        dictionary per habit in creation order with the keys name, periodicity, weeks (the
+        number of check-ins per weekday from Monday to Sunday as a tuple, by week number, in
+        order, for the weeks with check-ins) and trend (the weekly completion, see `weekly_trend`).
+    """
+    backend = get_backend(db)
+    calendar = calendar_for(backend.timezone())
+    today = (today or calendar.local_datetime(calendar.timestamp()).date()).toordinal()
+    # Ordinal 1 is a Monday
+    first_day = today - (today - 1) % 7 - 7 * (weeks - 1)
+    last_week = (today - 1) // 7
+    days_left = (today - 1) % 7 + 1
+    habits = []
+    # Rows arrive ordered by habit and week, so each habit's weeks are consumed as one group
+    for _, rows in groupby(backend.weekly_counts((first_day - 1) // 7, last_week), key=itemgetter(0)):
+        rows = list(rows)
+        _, name, periodicity = rows[0][:3]
+        habit_weeks = {row[3]: tuple(row[4:]) for row in rows if row[3] is not None}
+        if last_week in habit_weeks:
+            # Check-ins after today in the current week are left out
+            habit_weeks[last_week] = habit_weeks[last_week][:days_left] + (0,) * (7 - days_left)
+        habits.append({
+            "name": name,
+            "periodicity": periodicity.lower(),
+            "weeks": habit_weeks,
+            "trend": weekly_trend(habit_schedule(periodicity), habit_weeks, first_day, today),
+        })
+    return {"first_day": first_day, "today": today, "habits": habits}
+
+
+def weekly_trend(schedule, weeks, first_day, today):
+    """
+    Return, for every week from `first_day` on, the share of its days that fall in a satisfied period of
+    the schedule. Only the check-ins from `first_day` on are counted, and the last week ends on `today`.
+    Daily and weekly schedules are judged one week row at a time, other schedules day by day.
+
+    Parameters:
+    ----------
+    schedule : Schedule
+        The compiled schedule of the habit.
+    weeks : dict
+        The number of check-ins per weekday, as a tuple from Monday to Sunday, by week number in order.
+        Check-ins after `today` must be left out.
+    first_day : int
+        The ordinal of the first day, a Monday.
+    today : int
+        The ordinal of the last day.
+
+    Returns:
+    -------
+    List[float]
+        The completion of every week, between 0 and 1.
+    """
+    first_week, last_week = (first_day - 1) // 7, (today - 1) // 7
+    lengths = [7] * (last_week - first_week) + [(today - 1) % 7 + 1]
+    rows = [weeks.get(week, _NO_CHECK_INS) for week in range(first_week, last_week + 1)]
+    if schedule.text == "daily":
+        return [(7 - row.count(0)) / length for row, length in zip(rows, lengths)]
+    if schedule.text == "weekly" or schedule.text.endswith("per week"):
+        # The period is the week, so all of its days are covered once enough of them have check-ins
+        return [float(7 - row.count(0) >= schedule.target) for row in rows]
+
+    days = [7 * week + 1 + weekday for week, row in weeks.items() for weekday, check_ins in enumerate(row) if check_ins]
+    satisfied = set(schedule.satisfied_periods(days))
+    covered = list(map(satisfied.__contains__, map(schedule.period, range(first_day, today + 1))))
+    return [sum(covered[start:start + 7]) / len(covered[start:start + 7]) for start in range(0, len(covered), 7)]
+
+
+def _total_weeks(activity):
+    """
+    Return the number of check-ins per weekday of all habits together, by week number.
+    """
+    rows = {}
+    for habit in activity["habits"]:
+        for week, row in habit["weeks"].items():
+            rows.setdefault(week, []).append(row)
+    return {week: tuple(map(sum, zip(*week_rows))) for week, week_rows in rows.items()}
+
+
+def _columns(weeks, first_day, today):
+    """
+    Return the week rows of the heatmap columns from the week of `first_day` to the week of `today`.
+    """
+    return [weeks.get(week, _NO_CHECK_INS) for week in range((first_day - 1) // 7, (today - 1) // 7 + 1)]
+
+
+def _find_habit(activity, name):
+    for habit in activity["habits"]:
+        if habit["name"] == name:
+            return habit
+    raise ValueError(f"Habit with name '{name}' not found.")
+
+
+def _level(check_ins, busiest):
+    """
+    Return the shade of a heatmap cell, 0 for no check-ins and 4 for the busiest days.
+    """
+    return math.ceil(4 * check_ins / busiest) if check_ins else 0
+
+
+def heatmap_lines(weeks, first_day, today):
+    """
+    Draw a calendar heatmap for the terminal, one column per week and one row per weekday.
+
+    Parameters:
+    ----------
+    weeks : dict
+        The number of check-ins per weekday, as a tuple from Monday to Sunday, by week number.
+    first_day : int
+        The ordinal of the first day, a Monday.
+    today : int
+        The ordinal of the last day.
+
+    Returns:
+    -------
+    List[str]
+        A line of month names followed by the seven weekday lines.
+    """
+    columns = _columns(weeks, first_day, today)
+    busiest = max(map(max, columns))
+    weeks = len(columns)
+
+    # Month names go above the first week of each month, if the previous name leaves room
+    header = [" "] * weeks
+    free = 0
+    previous_month = None
+    for week in range(weeks):
+        monday = date.fromordinal(first_day + 7 * week)
+        if monday.month != previous_month and week >= free:
+            name = monday.strftime("%b")
+            header[week:week + len(name)] = name
+            free = week + len(name) + 1
+        previous_month = monday.month
+
+    lines = ["    " + "".join(header[:weeks])]
+    last_weekday = (today - first_day) % 7
+    for weekday, row in enumerate(zip(*columns)):
+        cells = "".join(SHADES[_level(check_ins, busiest)] for check_ins in row)
+        if weekday > last_weekday:
+            # The current week ends today
+            cells = cells[:-1]
+        lines.append(f"{WEEKDAY_LABELS[weekday]:4}{cells}".rstrip())
+    return lines
+
+
+def sparkline(values):
+    """
+    Draw values between 0 and 1 as a line of block characters.
+    """
+    return "".join(SPARKS[round(min(1.0, max(0.0, value)) * (len(SPARKS) - 1))] for value in values)
+
+
+def render_report(activity):
+    """
+    Render the terminal report: a heatmap of the check-ins of all habits, and the weekly
+    completion trend of every habit as a sparkline.
+
+    Parameters:
+    ----------
+    activity : dict
+        The report data, as returned by `get_activity`.
+
+    Returns:
+    -------
+    str
+        The report text.
+    """
+    first_day, today = activity["first_day"], activity["today"]
+    weeks = (today - first_day) // 7 + 1
+    # The sparkline column is as wide as its heading when the report has fewer weeks than that
+    width = max(weeks, len("Weekly completion"))
+    lines = [f"Check-ins of all habits in the last {weeks} weeks:", "",
+             *heatmap_lines(_total_weeks(activity), first_day, today), "",
+             f"{'Habit':30} {'Weekly completion':{width}} {'Average':>7}"]
+    for habit in activity["habits"]:
+        trend = habit["trend"]
+        # The average starts from the first week with a check-in, the habit may be younger than the report
+        active = trend[next((week for week, row in habit["weeks"].items() if any(row)), (today - 1) // 7)
+                       - (first_day - 1) // 7:]
+        lines.append(f"{habit['name'][:30]:30} {sparkline(trend):{width}} {sum(active) / len(active):7.0%}")
+    return "\n".join(lines)
+
+
+def render_habit(activity, name):
+    """
+    Render the heatmap and the weekly completion trend of one habit for the terminal.
+
+    Parameters:
+    ----------
+    activity : dict
+        The report data, as returned by `get_activity`.
+    name : str
+        The name of the habit.
+
+    Returns:
+    -------
+    str
+        The report text.
+
+    Raises:
+    ------
+    ValueError
+        If the habit is not in the report.
+    """
+    habit = _find_habit(activity, name)
+    first_day, today = activity["first_day"], activity["today"]
+    return "\n".join([
+        f"{habit['name']} ({habit['periodicity']}), {sum(map(sum, habit['weeks'].values()))} check-ins:", "",
+        *heatmap_lines(habit["weeks"], first_day, today), "",
+        f"    {sparkline(habit['trend'])}  weekly completion",
+    ])
+
+
+def heatmap_svg(weeks, first_day, today, tooltips=True):
+    """
+    Draw a calendar heatmap as an SVG image, one column per week and one row per weekday.
+    With tooltips, every cell has one with its date and number of check-ins.
+    """
+    columns = _columns(weeks, first_day, today)
+    busiest = max(map(max, columns))
+    weeks = len(columns)
+    step = CELL_SIZE + CELL_GAP
+    cells = []
+    for day in range(first_day, today + 1):
+        week, weekday = divmod(day - first_day, 7)
+        check_ins = columns[week][weekday]
+        cell = (f'<rect x="{week * step}" y="{weekday * step}" width="{CELL_SIZE}" height="{CELL_SIZE}" '
+                f'rx="2" fill="{COLORS[_level(check_ins, busiest)]}"')
+        if tooltips:
+            cell += f'><title>{date.fromordinal(day).isoformat()}: {check_ins}</title></rect>'
+        else:
+            cell += '/>'
+        cells.append(cell)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{weeks * step}" height="{7 * step}">'
+            + "".join(cells) + "</svg>")
+
+
+def trend_svg(trend, height=40):
+    """
+    Draw the weekly completion trend as an SVG line chart with one point per week.
+    """
+    step = CELL_SIZE + CELL_GAP
+    points = " ".join(f"{week * step + CELL_SIZE / 2:g},{(1 - share) * (height - 2) + 1:g}"
+                      for week, share in enumerate(trend))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{len(trend) * step}" height="{height}">'
+            f'<polyline points="{points}" fill="none" stroke="{COLORS[3]}" stroke-width="2"/></svg>')
+
+
+def export_html(activity, path):
+    """
+    Save the report as a static HTML page with an SVG heatmap and trend chart per habit.
+    Only the heatmap of all habits has tooltips, which would make up most of the page on every habit.
+
+    Parameters:
+    ----------
+    activity : dict
+        The report data, as returned by `get_activity`.
+    path : str
+        The file to write.
+
+    Returns:
+    -------
+    str
+        The path of the file.
+    """
+    first_day, today = activity["first_day"], activity["today"]
+    title = f"Habit report {date.fromordinal(first_day):%d/%m/%Y} - {date.fromordinal(today):%d/%m/%Y}"
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">', f'<title>{title}</title>',
+             '<style>body { font-family: sans-serif; } h2 { font-size: 1em; margin: 1.5em 0 0.3em; }</style>',
+             '</head><body>', f'<h1>{title}</h1>',
+             '<h2>All habits</h2>', heatmap_svg(_total_weeks(activity), first_day, today)]
+    for habit in activity["habits"]:
+        parts += [f"<h2>{html.escape(habit['name'])} ({html.escape(habit['periodicity'])})</h2>",
+                  heatmap_svg(habit["weeks"], first_day, today, tooltips=False), "<br>", trend_svg(habit["trend"])]
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n".join(parts))
+    return path
+
+
+def export_svg(activity, path, name=None):
+    """
+    Save the heatmap of one habit, or of all habits together, as a static SVG image.
+
+    Parameters:
+    ----------
+    activity : dict
+        The report data, as returned by `get_activity`.
+    path : str
+        The file to write.
+    name : str, optional
+        The name of the habit. Defaults to all habits.
+
+    Returns:
+    -------
+    str
+        The path of the file.
+
+    Raises:
+    ------
+    ValueError
+        If the habit is not in the report.
+    """
+    weeks = _total_weeks(activity) if name is None else _find_habit(activity, name)["weeks"]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(heatmap_svg(weeks, activity["first_day"], activity["today"]))
+    return path
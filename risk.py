@@ -0,0 +1,313 @@
+import math
+from array import array
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+from profiling import instrument
+from schedule import habit_schedule
+from storage import get_backend
+from timezones import calendar_for
+
+# Weight of the most recent gap in the moving average of the gaps between check-in days.
+CADENCE_SMOOTHING = 0.3
+
+# Weights of the logistic model that turns the features into a score between 0 and 1.
+BIAS = -3.0
+CADENCE_WEIGHT = 2.0
+BREAK_POINT_WEIGHT = 1.0
+LATENESS_WEIGHT = 2.5
+SLACK_WEIGHT = 1.0
+
+# Minutes past a habit's usual check-in time after which today counts as fully late.
+LATENESS_WINDOW = 120
+
+# Number of change log entries read per query while catching up with writes.
+CHANGES_PAGE_SIZE = 1000
+
+
+def _parse(increment_date):
+    """
+    Return the day ordinal and the minute of the day of a "dd/mm/YYYY HH:MM:SS" string.
+    """
+    day = date(int(increment_date[6:10]), int(increment_date[3:5]), int(increment_date[:2])).toordinal()
+    return day, int(increment_date[11:13]) * 60 + int(increment_date[14:16])
+
+
+class FeatureTable:
+    """
+        Compact feature vectors of many habits, stored column by column.
+
+        Every column is a typed array with one entry per habit, so a million habits
+        take a few dozen megabytes, and scoring runs one pass per column instead of
+        one Python object per habit. Features are updated one check-in at a time.
+        """
+
+    def __init__(self):
+        """
+               Initialize an empty FeatureTable.
+               """
+        self.period = array("l")        # largest gap in days that keeps up with the schedule, 0 for a deleted habit
+        self.last_day = array("l")      # day ordinal of the latest check-in
+        self.days = array("l")          # number of distinct check-in days
+        self.gap = array("d")           # moving average of the days between check-in days
+        self.streak = array("l")        # check-in days in the current streak
+        self.breaks = array("l")        # number of streaks that have ended
+        self.break_total = array("d")   # sum of the lengths of the streaks that have ended
+        self.minutes = array("d")       # sum of the check-in minutes of the day
+        self.minutes_squared = array("d")
+        self.check_ins = array("l")
+
+    def __len__(self):
+        return len(self.period)
+
+    def add_habit(self, period):
+        """
+                Add a habit without check-ins.
+
+                Parameters:
+                    period (int): The largest gap in days between check-ins that keeps up with the schedule.
+
+                Returns:
+                    int: The row of the habit.
+                """
+        for column in (self.period, self.last_day, self.days, self.streak, self.breaks, self.check_ins):
+            column.append(0)
+        for column in (self.gap, self.break_total, self.minutes, self.minutes_squared):
+            column.append(0.0)
+        self.period[-1] = period
+        return len(self.period) - 1
+
+    def reset_habit(self, row, period):
+        """
+                Forget the check-ins of a habit, for example before rebuilding it from its history.
+
+                Parameters:
+                    row (int): The row of the habit.
+                    period (int): The largest gap in days between check-ins, 0 to mark the habit as deleted.
+                """
+        for column in (self.last_day, self.days, self.streak, self.breaks, self.check_ins):
+            column[row] = 0
+        for column in (self.gap, self.break_total, self.minutes, self.minutes_squared):
+            column[row] = 0.0
+        self.period[row] = period
+
+    def add_check_in(self, row, day, minute):
+        """
+                Update the features of a habit with a check-in no older than its latest one.
+
+                Parameters:
+                    row (int): The row of the habit.
+                    day (int): The day ordinal of the check-in.
+                    minute (int): The minute of the day of the check-in.
+                """
+        self.check_ins[row] += 1
+        self.minutes[row] += minute
+        self.minutes_squared[row] += minute * minute
+
+        gap = day - self.last_day[row]
+        if self.days[row] == 0:
+            self.streak[row] = 1
+        elif gap == 0:
+            return
+        else:
+            self.gap[row] = gap if self.days[row] == 1 else (
+                CADENCE_SMOOTHING * gap + (1 - CADENCE_SMOOTHING) * self.gap[row])
+            if gap <= self.period[row]:
+                self.streak[row] += 1
+            else:
+                self.breaks[row] += 1
+                self.break_total[row] += self.streak[row]
+                self.streak[row] = 1
+        self.days[row] += 1
+        self.last_day[row] = day
+
+    def score(self, rows, today, minute):
+        """
+                Score habits in one batch: the likelihood that their streak breaks today.
+
+                A habit scores 0 when it has no check-ins, or is daily and has been checked off
+                today, and 1 when its streak is already broken. Otherwise the score rises when the
+                recent gaps between check-ins approach the period length, when the current streak
+                reaches the length at which past streaks usually ended, and when the day is later
+                than the time the habit is usually checked off.
+
+                Parameters:
+                    rows (Sequence[int]): The rows of the habits to score.
+                    today (int): The day ordinal to score for.
+                    minute (int): The current minute of the day.
+
+                Returns:
+                    List[float]: The scores, in the order of `rows`.
+                """
+        def take(column):
+            return list(map(column.__getitem__, rows))
+
+        period, last_day, days, gap = take(self.period), take(self.last_day), take(self.days), take(self.gap)
+        streak, breaks, break_total = take(self.streak), take(self.breaks), take(self.break_total)
+        minutes, minutes_squared, check_ins = take(self.minutes), take(self.minutes_squared), take(self.check_ins)
+
+        # Days left to check in without breaking the streak, today included
+        slack = [l + p - today + 1 for l, p in zip(last_day, period)]
+        cadence = [g / p if p else 0.0 for g, p in zip(gap, period)]
+        break_point = [min(2.0, s * b / t) if t else 0.0 for s, b, t in zip(streak, breaks, break_total)]
+        usual = [(m / n + math.sqrt(max(0.0, q / n - (m / n) ** 2))) if n else 1440.0
+                 for m, q, n in zip(minutes, minutes_squared, check_ins)]
+        lateness = [min(1.0, max(0.0, (minute - u) / LATENESS_WINDOW)) if s == 1 else 0.0
+                    for u, s in zip(usual, slack)]
+
+        scores = []
+        for p, d, l, s, c, b, late in zip(period, days, last_day, slack, cadence, break_point, lateness):
+            if not p or not d or l >= today and p == 1:
+                scores.append(0.0)
+            elif s < 1:
+                scores.append(1.0)
+            else:
+                z = (BIAS + CADENCE_WEIGHT * c + BREAK_POINT_WEIGHT * b + LATENESS_WEIGHT * late
+                     - SLACK_WEIGHT * (s - 1))
+                scores.append(1 / (1 + math.exp(-z)))
+        return scores
+
+
+class RiskEngine:
+    """
+        Scores how likely each habit is to break its streak today.
+
+        Days and times of day are those of the user's timezone when the engine
+        is built. Features are built once from the full history and then kept current by
+        tailing the change log: check-ins that arrive in order are added to the
+        features directly, anything else rebuilds just the habit concerned.
+        Scores are cached per habit until the next write to that habit, or until
+        the hour changes, since lateness is judged by the hour of the day.
+        """
+
+    def __init__(self, db):
+        """
+               Initialize a RiskEngine instance.
+
+               Parameters:
+                   db: The storage backend or database connection object.
+               """
+        self.backend = get_backend(db)
+        self.table = FeatureTable()
+        self.calendar = None
+        self._rows = {}
+        self._seq = None
+        self._scores = {}
+        self._scored_at = None
+        self._stale_scores = set()
+
+    @instrument
+    def rebuild(self):
+        """
+                Build the features of every habit from the full history in a single query.
+                """
+        self.table = FeatureTable()
+        self._rows = {}
+        self._scores = {}
+        self._scored_at = None
+        self._seq = self.backend.last_change_seq()
+        self.calendar = calendar_for(self.backend.timezone())
+        for _, rows in groupby(self.backend.dashboard_rows(), key=itemgetter(0)):
+            rows = list(rows)
+            row = self._rows[rows[0][1]] = self.table.add_habit(habit_schedule(rows[0][2]).max_gap)
+            check_ins = [self._local_time(check_in[4], check_in[5]) for check_in in rows if check_in[4] is not None]
+            for day, minute in sorted(check_ins):
+                self.table.add_check_in(row, day, minute)
+
+    def _local_time(self, increment_date, increment_ts):
+        """
+                Return the local day ordinal and minute of the day of a stored check-in.
+                """
+        if increment_ts is None:
+            return _parse(increment_date)
+        return self.calendar.day_and_minute(increment_ts)
+
+    def _rebuild_habit(self, name):
+        """
+                Rebuild the features of one habit from its history.
+                """
+        habit = self.backend.get_habit(name)
+        row = self._rows.get(name)
+        if habit is None:
+            if row is not None:
+                self.table.reset_habit(self._rows.pop(name), 0)
+            return
+        period = habit_schedule(habit[3]).max_gap
+        if row is None:
+            row = self._rows[name] = self.table.add_habit(period)
+        else:
+            self.table.reset_habit(row, period)
+        check_ins = self.backend.history(name)
+        for day, minute in sorted(self._local_time(increment_date, increment_ts)
+                                  for increment_date, _, increment_ts in check_ins):
+            self.table.add_check_in(row, day, minute)
+
+    @instrument
+    def refresh(self):
+        """
+                Apply the writes made since the last refresh, and drop the cached scores of the habits they touched.
+                """
+        if self._seq is None:
+            self.rebuild()
+            return
+        stale = {}
+        while True:
+            changes = self.backend.changes_since(self._seq, CHANGES_PAGE_SIZE)
+            if not changes:
+                break
+            if changes[0][0] != self._seq + 1:
+                # The changes in between have been pruned from the log
+                self.rebuild()
+                return
+            for _, operation, _, name, _, increment_date in changes:
+                self._scores.pop(name, None)
+                self._stale_scores.add(name)
+                row = self._rows.get(name)
+                if operation == "check_in_added" and row is not None and name not in stale:
+                    day, minute = _parse(increment_date)
+                    if day >= self.table.last_day[row]:
+                        self.table.add_check_in(row, day, minute)
+                        continue
+                stale[name] = None
+            self._seq = changes[-1][0]
+        for name in stale:
+            self._rebuild_habit(name)
+
+    @instrument
+    def scores(self, at=None):
+        """
+                Return the risk score of every habit, scoring only the habits changed since the last call.
+
+                Parameters:
+                    at (datetime, optional): The local time to score for. Defaults to now in the user's timezone.
+
+                Returns:
+                    Dict[str, float]: The score of every habit, between 0 and 1.
+                """
+        self.refresh()
+        at = at or self.calendar.local_datetime(self.calendar.timestamp())
+        scored_at = (at.date().toordinal(), at.hour * 60)
+        if scored_at != self._scored_at:
+            self._scores = dict(zip(self._rows, self.table.score(list(self._rows.values()), *scored_at)))
+            self._scored_at = scored_at
+        elif self._stale_scores:
+            names = [name for name in self._stale_scores if name in self._rows]
+            self._scores.update(zip(names, self.table.score([self._rows[name] for name in names], *scored_at)))
+        self._stale_scores = set()
+        return self._scores
+
+    @instrument
+    def at_risk(self, threshold=0.5, at=None):
+        """
+                Return the habits whose score reaches the threshold, riskiest first.
+
+                Parameters:
+                    threshold (float): The minimum score.
+                    at (datetime, optional): The local time to score for. Defaults to now in the user's timezone.
+
+                Returns:
+                    List[Tuple[str, float]]: (name, score) pairs.
+                """
+        scores = self.scores(at)
+        return sorted(((name, score) for name, score in scores.items() if score >= threshold),
+                      key=lambda item: (-item[1], item[0]))
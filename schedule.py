@@ -0,0 +1,256 @@
+import re
+from calendar import monthrange
+from datetime import date
+from functools import lru_cache
+
+# Schedules that can be stored as a habit's periodicity, with an example of each.
+SCHEDULE_EXAMPLES = ["daily", "weekly", "3 per week", "every 2 days", "monthly on the 1st"]
+
+_DAILY = re.compile(r"(?:daily|every day)")
+_WEEKLY = re.compile(r"(?:weekly|every week)")
+_PER_WEEK = re.compile(r"(\d+)\s*(?:x|×|times)?\s*(?:per|a|/)\s*week")
+_EVERY_DAYS = re.compile(r"every\s+(\d+)\s+days?")
+_MONTHLY = re.compile(r"monthly(?:\s+on\s+the\s+(\d+)(?:st|nd|rd|th)?)?")
+
+
+def _ordinal_suffix(day):
+    if day in (11, 12, 13):
+        return "th"
+    return {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+
+
+class Schedule:
+    """
+        A compiled habit schedule, which maps days to period indices.
+
+        A period is satisfied when the habit was checked off on at least `target`
+        different days within it, and a streak is a run of consecutive satisfied
+        periods. Days are passed as proleptic Gregorian ordinals (`date.toordinal()`),
+        and the period of each day is computed once and then looked up, so every
+        schedule costs about as much per check-in as the old daily/weekly loop.
+
+        Attributes:
+            text (str): The canonical form of the schedule, as stored in the database.
+            target (int): The number of check-in days needed per period.
+            max_gap (int): The largest number of days between check-ins that keeps up with the schedule.
+            period (Callable[[int], int]): Maps a day ordinal to the index of its period.
+            start (Callable[[int], int]): Maps a period index to the ordinal of its first day.
+        """
+
+    __slots__ = ("text", "target", "max_gap", "period", "start")
+
+    def __init__(self, text, target, max_gap, period, start):
+        self.text = text
+        self.target = target
+        self.max_gap = max_gap
+        self.period = period
+        self.start = start
+
+    def __repr__(self):
+        return f"Schedule({self.text!r})"
+
+    def satisfied_periods(self, days):
+        """
+                Return the indices of the satisfied periods, in increasing order.
+
+                Parameters:
+                    days (Iterable[int]): The sorted ordinals of the distinct check-in days.
+
+                Returns:
+                    List[int]: The indices of the periods with enough check-in days.
+                """
+        if self.text == "daily":
+            return list(days)
+        if self.target == 1:
+            # Periods of sorted days come in order, so dropping repeats leaves one entry per period
+            return list(dict.fromkeys(map(self.period, days)))
+
+        period, target = self.period, self.target
+        satisfied = []
+        current, count = None, 0
+        for index in map(period, days):
+            if index != current:
+                current, count = index, 0
+            count += 1
+            if count == target:
+                satisfied.append(index)
+        return satisfied
+
+    def streaks(self, days, today=None):
+        """
+                Calculate the longest and the current streak in days.
+
+                Parameters:
+                    days (Iterable[int]): The sorted ordinals of the distinct check-in days.
+                    today (int, optional): The ordinal of today. The current streak is 0 unless its
+                                           last period is the current or the previous one.
+
+                Returns:
+                    Tuple[int, int]: The longest and the current streak, in days.
+                """
+        satisfied = self.satisfied_periods(days)
+        if not satisfied:
+            return 0, 0
+
+        start = self.start
+        longest = 0
+        first = previous = satisfied[0]
+        for index in satisfied[1:]:
+            if index != previous + 1:
+                # Streak lengths are only measured in days once per run of consecutive periods
+                longest = max(longest, start(previous + 1) - start(first))
+                first = index
+            previous = index
+        current = start(previous + 1) - start(first)
+        longest = max(longest, current)
+
+        if today is not None and previous < self.period(today) - 1:
+            current = 0
+        return longest, current
+
+    def completion_rate(self, days, first_day, today):
+        """
+                Return the share of the periods from `first_day` to `today` that are satisfied.
+
+                Parameters:
+                    days (Iterable[int]): The sorted ordinals of the distinct check-in days.
+                    first_day (int): The ordinal of the first day to count from.
+                    today (int): The ordinal of today.
+
+                Returns:
+                    float: A share between 0 and 1.
+                """
+        first, last = self.period(first_day), self.period(today)
+        if last < first:
+            return 0.0
+        completed = sum(1 for index in self.satisfied_periods(days) if first <= index <= last)
+        return min(1.0, completed / (last - first + 1))
+
+
+class _PeriodCache(dict):
+    """
+    Remembers the period of every day looked up. Habits share the same calendar days, so
+    almost every lookup is a dictionary hit that never runs any Python code.
+    """
+
+    def __init__(self, compute):
+        super().__init__()
+        self.compute = compute
+
+    def __missing__(self, day):
+        period = self[day] = self.compute(day)
+        return period
+
+
+def _monthly(day_of_month):
+    def period(day):
+        d = date.fromordinal(day)
+        due = min(day_of_month, monthrange(d.year, d.month)[1])
+        return d.year * 12 + d.month - 1 - (d.day < due)
+
+    def start(index):
+        year, month = divmod(index, 12)
+        return date(year, month + 1, min(day_of_month, monthrange(year, month + 1)[1])).toordinal()
+
+    return _PeriodCache(period).__getitem__, start
+
+
+@lru_cache(maxsize=256)
+def compile_schedule(text):
+    """
+    Parse a schedule and compile it into an evaluator. Results are cached, so a schedule shared
+    by many habits is only parsed once.
+
+    Parameters:
+    ----------
+    text : str
+        The schedule, e.g. "daily", "weekly", "3 per week", "every 2 days" or "monthly on the 1st".
+        Weeks start on Monday.
+
+    Returns:
+    -------
+    Schedule
+        The compiled schedule.
+
+    Raises:
+    ------
+    ValueError
+        If the text is not a valid schedule.
+    """
+    normalized = " ".join(str(text or "").lower().split())
+
+    if _DAILY.fullmatch(normalized):
+        return Schedule("daily", 1, 1, _PeriodCache(lambda day: day).__getitem__, lambda index: index)
+
+    match = _PER_WEEK.fullmatch(normalized)
+    if _WEEKLY.fullmatch(normalized) or match:
+        times = int(match.group(1)) if match else 1
+        if not 1 <= times <= 7:
+            raise ValueError(f"A habit can be checked off 1 to 7 times per week, not {times}.")
+        # Ordinal 1 is a Monday
+        return Schedule("weekly" if times == 1 else f"{times} per week", times, 7 // times,
+                        _PeriodCache(lambda day: (day - 1) // 7).__getitem__, lambda index: index * 7 + 1)
+
+    match = _EVERY_DAYS.fullmatch(normalized)
+    if match:
+        interval = int(match.group(1))
+        if interval < 1:
+            raise ValueError("The interval of a habit must be at least 1 day.")
+        if interval == 1:
+            return compile_schedule("daily")
+        return Schedule(f"every {interval} days", 1, interval,
+                        _PeriodCache(lambda day: day // interval).__getitem__, lambda index: index * interval)
+
+    match = _MONTHLY.fullmatch(normalized)
+    if match:
+        day_of_month = int(match.group(1) or 1)
+        if not 1 <= day_of_month <= 31:
+            raise ValueError(f"A monthly habit is due on day 1 to 31 of the month, not {day_of_month}.")
+        return Schedule(f"monthly on the {day_of_month}{_ordinal_suffix(day_of_month)}", 1, 31,
+                        *_monthly(day_of_month))
+
+    raise ValueError(f"Unknown periodicity '{text}'. Use one of: {', '.join(SCHEDULE_EXAMPLES)}.")
+
+
+@lru_cache(maxsize=256)
+def habit_schedule(periodicity):
+    """
+    Return the compiled schedule of a stored habit. Periodicities saved before schedules were
+    validated are read as weekly if they cannot be parsed, as they always have been.
+
+    Parameters:
+    ----------
+    periodicity : str
+        The periodicity column of the habit.
+
+    Returns:
+    -------
+    Schedule
+        The compiled schedule.
+    """
+    try:
+        return compile_schedule(periodicity)
+    except ValueError:
+        return compile_schedule("weekly")
+
+
+def normalize_schedule(text):
+    """
+    Validate a schedule and return its canonical form, which is what gets stored.
+
+    Parameters:
+    ----------
+    text : str
+        The schedule as entered by the user.
+
+    Returns:
+    -------
+    str
+        The canonical schedule text.
+
+    Raises:
+    ------
+    ValueError
+        If the text is not a valid schedule.
+    """
+    return compile_schedule(text).text
@@ -0,0 +1,214 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from profiling import instrument
+from storage import get_backend
+
+# Upper bound on the number of trigram postings visited by a fuzzy lookup, which
+# keeps its latency flat however large the catalog grows.
+FUZZY_POSTINGS_LIMIT = 50000
+
+
+def _words(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def _trigrams(text):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class HabitIndex:
+    """
+        An in-memory search index over habit names and descriptions.
+
+        Prefix lookups run a binary search over sorted word lists, so they take the
+        same time for ten habits as for a hundred thousand. Fuzzy lookups score
+        habit names by the trigrams they share with the query.
+        """
+
+    def __init__(self, habits=()):
+        """
+               Initialize a HabitIndex instance.
+
+               Parameters:
+                   habits (Iterable[Tuple[str, str]], optional): (name, description) pairs to index.
+               """
+        self._descriptions = {}
+        self._names = []
+        self._words = []
+        self._trigrams = {}
+        for name, description in habits:
+            self._descriptions[name] = description
+            self._names.append((name.lower(), name))
+            self._words.extend((word, name) for word in set(_words(name) + _words(description)))
+            for trigram in _trigrams(name):
+                self._trigrams.setdefault(trigram, []).append(name)
+        self._names.sort()
+        self._words.sort()
+
+
+    @classmethod
+    @instrument
+    def from_db(cls, db):
+        """
+        Build an index over all habits in the database with a single query.
+
+        Parameters:
+            db: The storage backend or database connection object.
+
+        Returns:
+            HabitIndex: The index.
+        """
+        return cls(get_backend(db).habit_details())
+
+
+    def __len__(self):
+        return len(self._descriptions)
+
+
+    def __contains__(self, name):
+        return name in self._descriptions
+
+
+    def add(self, name, description):
+        """
+                Add a habit to the index.
+
+                Parameters:
+                    name (str): The name of the habit.
+                    description (str): A brief description of the habit.
+                """
+        if name in self._descriptions:
+            self.remove(name)
+        self._descriptions[name] = description
+        insort(self._names, (name.lower(), name))
+        for word in set(_words(name) + _words(description)):
+            insort(self._words, (word, name))
+        for trigram in _trigrams(name):
+            self._trigrams.setdefault(trigram, []).append(name)
+
+
+    def remove(self, name):
+        """
+                Remove a habit from the index. Unknown names are ignored.
+
+                Parameters:
+                    name (str): The name of the habit.
+                """
+        if name not in self._descriptions:
+            return
+        description = self._descriptions.pop(name)
+        del self._names[bisect_left(self._names, (name.lower(), name))]
+        for word in set(_words(name) + _words(description)):
+            del self._words[bisect_left(self._words, (word, name))]
+        for trigram in _trigrams(name):
+            self._trigrams[trigram].remove(name)
+
+
+    @staticmethod
+    def _prefix_range(entries, prefix):
+        """
+                Yield the names of the sorted (key, name) entries whose key starts with prefix.
+                """
+        for i in range(bisect_left(entries, (prefix,)), len(entries)):
+            key, name = entries[i]
+            if not key.startswith(prefix):
+                break
+            yield name
+
+
+    def _prefix_matches(self, query):
+        """
+                Yield matching names lazily: names starting with the query first, then
+                habits where every query word starts a word of the name or description.
+                """
+        yield from self._prefix_range(self._names, query.lower())
+        words = _words(query)
+        if not words:
+            return
+        others = words[:-1]
+        for name in self._prefix_range(self._words, words[-1]):
+            if others:
+                habit_words = _words(name) + _words(self._descriptions[name])
+                if not all(any(word.startswith(other) for word in habit_words) for other in others):
+                    continue
+            yield name
+
+
+    @instrument
+    def prefix(self, query, offset=0, limit=20):
+        """
+                Find habits by prefix, one page at a time.
+
+                Parameters:
+                    query (str): The text typed so far.
+                    offset (int): The number of matches to skip.
+                    limit (int): The maximum number of matches to return.
+
+                Returns:
+                    List[str]: The names of the matching habits.
+                """
+        results = []
+        seen = set()
+        for name in self._prefix_matches(query):
+            if name in seen:
+                continue
+            seen.add(name)
+            if len(seen) > offset:
+                results.append(name)
+                if len(results) == limit:
+                    break
+        return results
+
+
+    @instrument
+    def fuzzy(self, query, limit=20):
+        """
+                Find the habits whose names are closest to the query, tolerating typos.
+
+                Parameters:
+                    query (str): The text typed so far.
+                    limit (int): The maximum number of matches to return.
+
+                Returns:
+                    List[str]: The names of the best matching habits, best first.
+                """
+        query_trigrams = _trigrams(query)
+        postings = sorted((self._trigrams[t] for t in query_trigrams if t in self._trigrams), key=len)
+        scores = Counter()
+        visited = 0
+        for names in postings:
+            # Rare trigrams are the most selective, common ones are skipped once the budget is spent
+            if visited and visited + len(names) > FUZZY_POSTINGS_LIMIT:
+                break
+            scores.update(names)
+            visited += len(names)
+        # A name has to share at least a third of the query's trigrams to count as a match
+        matches = ((name, score) for name, score in scores.items() if score * 3 >= len(query_trigrams))
+        return [name for name, _ in heapq.nsmallest(limit, matches, key=lambda item: (-item[1], item[0]))]
+
+
+    @instrument
+    def search(self, query, offset=0, limit=20):
+        """
+                Find habits for type-ahead selection: prefix matches first, topped up
+                with fuzzy matches on the first page when there are not enough of them.
+
+                Parameters:
+                    query (str): The text typed so far.
+                    offset (int): The number of matches to skip.
+                    limit (int): The maximum number of matches to return.
+
+                Returns:
+                    List[str]: The names of the matching habits.
+                """
+        results = self.prefix(query, offset, limit)
+        if offset == 0 and len(results) < limit and len(query.strip()) >= 3:
+            for name in self.fuzzy(query, limit):
+                if name not in results:
+                    results.append(name)
+                    if len(results) == limit:
+                        break
+        return results
@@ -0,0 +1,584 @@
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import date
+from operator import itemgetter
+from profiling import instrument
+import queries
+from timezones import calendar_for, system_timezone
+
+
+def _create_tables(db):
+    for statement in queries.SCHEMA:
+        db.execute(statement)
+
+
+def _create_change_log(db):
+    for statement in queries.CHANGE_LOG_SCHEMA:
+        db.execute(statement)
+
+
+def _add_sync_columns(db):
+    for statement in queries.SYNC_SCHEMA:
+        db.execute(statement)
+
+
+def _pin_check_in_times(db, calendar):
+    """
+    Give the check-ins without a timestamp the one of their local date string in the calendar's timezone.
+    """
+    rows = []
+    for counter_id, increment_date in db.execute(queries.SELECT_UNTIMED_CHECK_INS).fetchall():
+        try:
+            rows.append((calendar.parse(increment_date), counter_id))
+        except (TypeError, ValueError):
+            continue  # not a date string, left to be read as it is
+    db.executemany(queries.UPDATE_CHECK_IN_TIMESTAMP, rows)
+
+
+def _add_check_in_timestamps(db):
+    db.execute(queries.MIGRATE_ADD_COUNTERS_TIMESTAMP)
+    db.execute(queries.MIGRATE_DEFAULT_TIMEZONE, (system_timezone(),))
+    # Existing check-ins were written in the local time of this machine
+    _pin_check_in_times(db, calendar_for(db.execute(queries.SELECT_TIMEZONE).fetchone()[0]))
+
+
+def _local_day(increment_date):
+    """
+    Return the day ordinal of a "dd/mm/YYYY HH:MM:SS" string, or None if it is not a date.
+    """
+    try:
+        return date(int(increment_date[6:10]), int(increment_date[3:5]), int(increment_date[:2])).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _rewrite_check_in_dates(db, calendar):
+    """
+    Rewrite the date strings of the check-ins with a timestamp in the local time of the calendar's timezone.
+    """
+    db.executemany(queries.UPDATE_CHECK_IN_DATE,
+                   [(calendar.format(increment_ts), counter_id)
+                    for counter_id, increment_ts in db.execute(queries.SELECT_TIMED_CHECK_INS).fetchall()])
+
+
+def _create_weekly_counts(db):
+    for statement in queries.REPORT_SCHEMA:
+        db.execute(statement)
+
+
+# Migration steps, in order. MIGRATIONS[i] upgrades a database from user_version i to i + 1.
+MIGRATIONS = [
+    _create_tables,
+    _create_change_log,
+    _add_sync_columns,
+    _add_check_in_timestamps,
+    _create_weekly_counts,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+@instrument
+def ensure_schema(db):
+    """
+    Bring the schema of a SQLite database up to date. The schema version is stored in
+    `PRAGMA user_version`, so once a file is up to date this costs a single pragma read.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+
+    Returns:
+    -------
+    int
+        The schema version of the database.
+    """
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        # Another connection may have migrated the file while we waited for the lock
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        for migrate in MIGRATIONS[version:]:
+            migrate(db)
+        db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return SCHEMA_VERSION
+
+
+class StorageBackend(ABC):
+    """
+        The interface every storage backend implements. `Habit`, `db`, `analyse` and
+        the `HabitStore` only talk to storage through these methods.
+
+        Check-ins are stored as a UTC epoch timestamp together with their date as a
+        "dd/mm/YYYY HH:MM:SS" string in the local time of the user's timezone. The
+        timestamp is None for check-ins written without one, whose string is read as is.
+        The number of check-ins per habit and local day is kept as they are written.
+
+        Writes that would break the stored data, such as a habit without a name or
+        periodicity or a second habit with the same name, raise ValueError on every backend.
+        """
+
+    @abstractmethod
+    def initialize(self):
+        """Create the storage if it does not exist yet."""
+
+    @abstractmethod
+    def add_habit(self, name, description, periodicity, creation_date):
+        """Save a new habit and return its ID. Raises ValueError if the name is taken or a field is missing."""
+
+    @abstractmethod
+    def get_habit(self, name):
+        """Return (id, name, description, periodicity) of a habit, or None if it does not exist."""
+
+    @abstractmethod
+    def habit_id(self, name):
+        """Return the ID of a habit, or None if it does not exist."""
+
+    @abstractmethod
+    def habit_names(self, periodicity=None):
+        """Return the names of all habits, or of those with the given periodicity."""
+
+    @abstractmethod
+    def habit_details(self):
+        """Return (name, description) of every habit."""
+
+    @abstractmethod
+    def count_habits(self):
+        """Return the number of habits."""
+
+    @abstractmethod
+    def delete_habit(self, habit_id):
+        """Delete a habit and its check-ins."""
+
+    @abstractmethod
+    def delete_habit_by_name(self, name):
+        """Delete a habit and its check-ins. Unknown names are ignored."""
+
+    @abstractmethod
+    def timezone(self):
+        """Return the IANA name of the timezone the user's local days are counted in."""
+
+    @abstractmethod
+    def set_timezone(self, name):
+        """
+        Change the user's timezone. Check-ins without a timestamp are given the one of their
+        date string in the previous timezone first, so they keep the moment they were made,
+        and the date strings of all check-ins are then rewritten in the new timezone.
+        """
+
+    @abstractmethod
+    def add_check_in(self, habit_id, increment_date, increment_ts=None):
+        """Record a check-in of a habit."""
+
+    @abstractmethod
+    def add_check_ins(self, rows):
+        """Record many (habit_id, increment_date) or (habit_id, increment_date, increment_ts) check-ins at once."""
+
+    @abstractmethod
+    def check_in_by_name(self, name, increment_date, increment_ts=None):
+        """Record a check-in of a habit. Returns False if the habit does not exist."""
+
+    @abstractmethod
+    def count_check_ins(self, habit_id):
+        """Return the number of check-ins of a habit."""
+
+    @abstractmethod
+    def count_check_ins_by_name(self, name):
+        """Return the number of check-ins of a habit, 0 if it does not exist."""
+
+    @abstractmethod
+    def delete_check_ins(self, habit_id):
+        """Delete all check-ins of a habit."""
+
+    @abstractmethod
+    def delete_check_ins_by_name(self, name):
+        """Delete all check-ins of a habit. Unknown names are ignored."""
+
+    @abstractmethod
+    def history(self, name):
+        """Return (increment_date, periodicity, increment_ts) of every check-in of a habit."""
+
+    @abstractmethod
+    def history_all(self):
+        """Return (increment_date, periodicity, increment_ts) of every check-in of every habit."""
+
+    @abstractmethod
+    def dashboard_rows(self):
+        """
+        Return (habit_id, name, periodicity, creation_date, increment_date, increment_ts) rows ordered
+        by habit ID, one per check-in, and a single row with None dates for habits without any.
+        """
+
+    @abstractmethod
+    def weekly_counts(self, first_week, last_week):
+        """
+        Return (habit_id, name, periodicity, week, mon, tue, wed, thu, fri, sat, sun) rows ordered by
+        habit ID and week, with the number of check-ins per local day of every week with check-ins between
+        `first_week` and `last_week`, and a single row of Nones after the periodicity for habits
+        without any. Week w runs from day ordinal 7w + 1, a Monday, to 7w + 7.
+        """
+
+    @abstractmethod
+    def changes_since(self, seq, limit):
+        """
+        Return up to `limit` change log entries with a sequence number above `seq`, oldest first, as
+        (seq, operation, habit_id, habit_name, counter_id, increment_date) tuples. The operation is one of
+        "habit_added", "habit_deleted", "check_in_added" and "check_in_removed".
+        """
+
+    @abstractmethod
+    def last_change_seq(self):
+        """Return the sequence number of the latest change, 0 if nothing has changed yet."""
+
+    @abstractmethod
+    def clear(self):
+        """Delete all habits and check-ins."""
+
+
+class SQLiteBackend(StorageBackend):
+    """
+        A storage backend on a SQLite connection. Every write is committed immediately.
+
+        Attributes:
+            db (sqlite3.Connection): The database connection object.
+        """
+
+    def __init__(self, db):
+        self.db = db
+
+    def initialize(self):
+        ensure_schema(self.db)
+
+    def add_habit(self, name, description, periodicity, creation_date):
+        if name is None or periodicity is None:
+            raise ValueError("A habit needs a name and a periodicity.")
+        try:
+            cursor = self.db.execute(queries.INSERT_HABIT, (name, description, periodicity, creation_date))
+        except sqlite3.IntegrityError:
+            self.db.rollback()
+            raise ValueError(f"Habit with name '{name}' already exists.")
+        self.db.commit()
+        return cursor.lastrowid
+
+    def get_habit(self, name):
+        return self.db.execute(queries.SELECT_HABIT_BY_NAME, (name,)).fetchone()
+
+    def habit_id(self, name):
+        row = self.db.execute(queries.SELECT_HABIT_ID_BY_NAME, (name,)).fetchone()
+        return row[0] if row else None
+
+    def habit_names(self, periodicity=None):
+        if periodicity is None:
+            cursor = self.db.execute(queries.SELECT_HABIT_NAMES)
+        else:
+            cursor = self.db.execute(queries.SELECT_HABIT_NAMES_BY_PERIODICITY, (periodicity,))
+        return [row[0] for row in cursor]
+
+    def habit_details(self):
+        return self.db.execute(queries.SELECT_HABIT_NAMES_AND_DESCRIPTIONS).fetchall()
+
+    def count_habits(self):
+        return self.db.execute(queries.COUNT_HABITS).fetchone()[0]
+
+    def delete_habit(self, habit_id):
+        # Counters go first, so the change log can still name the habit they belonged to
+        self.db.execute(queries.DELETE_COUNTERS_BY_HABIT_ID, (habit_id,))
+        self.db.execute(queries.DELETE_HABIT_BY_ID, (habit_id,))
+        self.db.commit()
+
+    def delete_habit_by_name(self, name):
+        self.db.execute(queries.DELETE_COUNTERS_BY_HABIT_NAME, (name,))
+        self.db.execute(queries.DELETE_HABIT_BY_NAME, (name,))
+        self.db.commit()
+
+    def timezone(self):
+        return self.db.execute(queries.SELECT_TIMEZONE).fetchone()[0]
+
+    def set_timezone(self, name):
+        calendar = calendar_for(name)
+        if self.db.in_transaction:
+            self.db.commit()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            _pin_check_in_times(self.db, calendar_for(self.timezone()))
+            # Triggers move the weekly counts along with the date strings
+            _rewrite_check_in_dates(self.db, calendar)
+            self.db.execute(queries.UPSERT_TIMEZONE, (calendar.name,))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def add_check_in(self, habit_id, increment_date, increment_ts=None):
+        self.db.execute(queries.INSERT_COUNTER_AT, (habit_id, increment_date, increment_ts))
+        self.db.commit()
+
+    def add_check_ins(self, rows):
+        self.db.executemany(queries.INSERT_COUNTER_AT, ((*row, None)[:3] for row in rows))
+        self.db.commit()
+
+    def check_in_by_name(self, name, increment_date, increment_ts=None):
+        # The habit lookup and the insert run as a single statement
+        inserted = self.db.execute(queries.INSERT_COUNTER_BY_HABIT_NAME,
+                                   (increment_date, increment_ts, name)).rowcount
+        self.db.commit()
+        return inserted > 0
+
+    def count_check_ins(self, habit_id):
+        return self.db.execute(queries.COUNT_COUNTERS_BY_HABIT_ID, (habit_id,)).fetchone()[0]
+
+    def count_check_ins_by_name(self, name):
+        return self.db.execute(queries.COUNT_COUNTERS_BY_HABIT_NAME, (name,)).fetchone()[0]
+
+    def delete_check_ins(self, habit_id):
+        self.db.execute(queries.DELETE_COUNTERS_BY_HABIT_ID, (habit_id,))
+        self.db.commit()
+
+    def delete_check_ins_by_name(self, name):
+        self.db.execute(queries.DELETE_COUNTERS_BY_HABIT_NAME, (name,))
+        self.db.commit()
+
+    def history(self, name):
+        return self.db.execute(queries.SELECT_HISTORY_BY_HABIT_NAME, (name,)).fetchall()
+
+    def history_all(self):
+        return self.db.execute(queries.SELECT_HISTORY_ALL).fetchall()
+
+    def dashboard_rows(self):
+        return self.db.execute(queries.SELECT_DASHBOARD_HISTORY)
+
+    def weekly_counts(self, first_week, last_week):
+        return self.db.execute(queries.SELECT_WEEKLY_COUNTS, (first_week, last_week))
+
+    def changes_since(self, seq, limit):
+        return self.db.execute(queries.SELECT_CHANGES_SINCE, (seq, limit)).fetchall()
+
+    def last_change_seq(self):
+        return self.db.execute(queries.SELECT_LAST_CHANGE_SEQ).fetchone()[0]
+
+    def clear(self):
+        self.db.execute(queries.DELETE_ALL_COUNTERS)
+        self.db.execute(queries.DELETE_ALL_HABITS)
+        self.db.commit()
+
+
+class MemoryBackend(StorageBackend):
+    """
+        A storage backend that keeps everything in dictionaries, for tests, benchmarks
+        and other ephemeral workloads. Nothing is persisted.
+
+        Attributes:
+            retention (int): The number of most recent changes kept in the change log.
+        """
+
+    def __init__(self, retention=queries.CHANGE_LOG_RETENTION, timezone=None):
+        self.retention = retention
+        self._timezone = calendar_for(timezone or system_timezone()).name
+        self._habits = {}       # habit id -> [name, description, periodicity, creation_date]
+        self._ids = {}          # habit name -> habit id
+        self._check_ins = {}    # habit id -> list of (counter id, increment date, increment timestamp)
+        self._daily = {}        # habit id -> {day ordinal: number of check-ins}
+        self._next_id = 1
+        self._next_counter_id = 1
+        self._changes = []      # the change log, sequence numbers are contiguous from _first_seq
+        self._first_seq = 1
+
+    def _log(self, operation, habit_id, counter_id=None, increment_date=None):
+        habit = self._habits.get(habit_id)
+        seq = self._first_seq + len(self._changes)
+        self._changes.append((seq, operation, habit_id, habit[0] if habit else None, counter_id, increment_date))
+        # Trim in batches so that appending stays O(1) on average
+        if len(self._changes) >= 2 * self.retention:
+            excess = len(self._changes) - self.retention
+            del self._changes[:excess]
+            self._first_seq += excess
+
+    def initialize(self):
+        pass
+
+    def add_habit(self, name, description, periodicity, creation_date):
+        if name is None or periodicity is None:
+            raise ValueError("A habit needs a name and a periodicity.")
+        if name in self._ids:
+            raise ValueError(f"Habit with name '{name}' already exists.")
+        habit_id = self._next_id
+        self._next_id += 1
+        self._habits[habit_id] = [name, description, periodicity, creation_date]
+        self._ids[name] = habit_id
+        self._check_ins.setdefault(habit_id, [])
+        self._log("habit_added", habit_id)
+        return habit_id
+
+    def get_habit(self, name):
+        habit_id = self._ids.get(name)
+        if habit_id is None:
+            return None
+        _, description, periodicity, _ = self._habits[habit_id]
+        return habit_id, name, description, periodicity
+
+    def habit_id(self, name):
+        return self._ids.get(name)
+
+    def habit_names(self, periodicity=None):
+        return [habit[0] for habit in self._habits.values() if periodicity is None or habit[2] == periodicity]
+
+    def habit_details(self):
+        return [(habit[0], habit[1]) for habit in self._habits.values()]
+
+    def count_habits(self):
+        return len(self._habits)
+
+    def delete_habit(self, habit_id):
+        self.delete_check_ins(habit_id)
+        self._check_ins.pop(habit_id, None)
+        if habit_id in self._habits:
+            self._log("habit_deleted", habit_id)
+            del self._ids[self._habits.pop(habit_id)[0]]
+
+    def delete_habit_by_name(self, name):
+        habit_id = self._ids.get(name)
+        if habit_id is not None:
+            self.delete_habit(habit_id)
+
+    def timezone(self):
+        return self._timezone
+
+    def set_timezone(self, name):
+        new_calendar = calendar_for(name)
+        calendar = calendar_for(self._timezone)
+        for habit_id, check_ins in self._check_ins.items():
+            rewritten = []
+            daily = self._daily[habit_id] = {}
+            for counter_id, increment_date, increment_ts in check_ins:
+                if increment_ts is None:
+                    try:
+                        increment_ts = calendar.parse(increment_date)
+                    except (TypeError, ValueError):
+                        pass  # not a date string, left to be read as it is
+                if increment_ts is not None:
+                    increment_date = new_calendar.format(increment_ts)
+                rewritten.append((counter_id, increment_date, increment_ts))
+                day = _local_day(increment_date)
+                if day is not None:
+                    daily[day] = daily.get(day, 0) + 1
+            self._check_ins[habit_id] = rewritten
+        self._timezone = new_calendar.name
+
+    def add_check_in(self, habit_id, increment_date, increment_ts=None):
+        # Like the SQLite schema, the habit ID is not checked
+        counter_id = self._next_counter_id
+        self._next_counter_id += 1
+        self._check_ins.setdefault(habit_id, []).append((counter_id, increment_date, increment_ts))
+        day = _local_day(increment_date)
+        if day is not None:
+            daily = self._daily.setdefault(habit_id, {})
+            daily[day] = daily.get(day, 0) + 1
+        self._log("check_in_added", habit_id, counter_id, increment_date)
+
+    def add_check_ins(self, rows):
+        for row in rows:
+            self.add_check_in(*row)
+
+    def check_in_by_name(self, name, increment_date, increment_ts=None):
+        habit_id = self._ids.get(name)
+        if habit_id is None:
+            return False
+        self.add_check_in(habit_id, increment_date, increment_ts)
+        return True
+
+    def count_check_ins(self, habit_id):
+        return len(self._check_ins.get(habit_id, ()))
+
+    def count_check_ins_by_name(self, name):
+        habit_id = self._ids.get(name)
+        return 0 if habit_id is None else self.count_check_ins(habit_id)
+
+    def delete_check_ins(self, habit_id):
+        for counter_id, increment_date, _ in self._check_ins.get(habit_id, ()):
+            self._log("check_in_removed", habit_id, counter_id, increment_date)
+        if habit_id in self._check_ins:
+            self._check_ins[habit_id] = []
+        self._daily.pop(habit_id, None)
+
+    def delete_check_ins_by_name(self, name):
+        habit_id = self._ids.get(name)
+        if habit_id is not None:
+            self.delete_check_ins(habit_id)
+
+    def history(self, name):
+        habit_id = self._ids.get(name)
+        if habit_id is None:
+            return []
+        periodicity = self._habits[habit_id][2]
+        return [(increment_date, periodicity, increment_ts)
+                for _, increment_date, increment_ts in sorted(self._check_ins[habit_id], key=itemgetter(1))]
+
+    def history_all(self):
+        return sorted(((increment_date, habit[2], increment_ts)
+                       for habit_id, habit in self._habits.items()
+                       for _, increment_date, increment_ts in self._check_ins[habit_id]),
+                      key=itemgetter(0, 1))
+
+    def dashboard_rows(self):
+        for habit_id, (name, _, periodicity, creation_date) in self._habits.items():
+            check_ins = self._check_ins[habit_id] or [(None, None, None)]
+            for _, increment_date, increment_ts in check_ins:
+                yield habit_id, name, periodicity, creation_date, increment_date, increment_ts
+
+    def weekly_counts(self, first_week, last_week):
+        for habit_id, (name, _, periodicity, _) in self._habits.items():
+            weeks = {}
+            for day, check_ins in self._daily.get(habit_id, {}).items():
+                week, weekday = divmod(day - 1, 7)
+                if first_week <= week <= last_week:
+                    weeks.setdefault(week, [0] * 7)[weekday] = check_ins
+            if not weeks:
+                yield habit_id, name, periodicity, *[None] * 8
+            for week in sorted(weeks):
+                yield habit_id, name, periodicity, week, *weeks[week]
+
+    def changes_since(self, seq, limit):
+        start = max(0, seq + 1 - self._first_seq)
+        return self._changes[start:start + limit]
+
+    def last_change_seq(self):
+        return self._first_seq + len(self._changes) - 1
+
+    def clear(self):
+        for habit_id in list(self._check_ins):
+            self.delete_check_ins(habit_id)
+        for habit_id in list(self._habits):
+            self.delete_habit(habit_id)
+        self._check_ins.clear()
+        self._daily.clear()
+
+
+def get_backend(db):
+    """
+    Return the storage backend for `db`, wrapping SQLite connections in a SQLiteBackend.
+
+    Parameters:
+    ----------
+    db : StorageBackend or sqlite3.Connection
+        A storage backend or a database connection object.
+
+    Returns:
+    -------
+    StorageBackend
+        The storage backend.
+    """
+    if isinstance(db, StorageBackend):
+        return db
+    if isinstance(db, sqlite3.Connection):
+        return SQLiteBackend(db)
+    raise TypeError(f"Unsupported storage: {type(db).__name__}")
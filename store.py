@@ -0,0 +1,272 @@
+from datetime import datetime
+from profiling import instrument
+from risk import RiskEngine
+from schedule import normalize_schedule
+from search import HabitIndex
+from storage import get_backend
+from timezones import calendar_for
+
+# Catalogs with more habits than this are chosen from with type-ahead search instead of a list.
+SELECT_MENU_LIMIT = 50
+
+
+class HabitStore:
+    """
+        A data-access object that owns a storage backend and runs every habit
+        operation with as few statements as possible.
+
+        Habit ids are cached by name once they have been seen, and operations that
+        need both a lookup and a write run them together in a single statement.
+        A search index over the habits is built on first use and kept up to date,
+        and so is the engine that scores which habits are at risk.
+
+        Attributes:
+            db (StorageBackend or sqlite3.Connection): The storage passed to the store.
+            backend (StorageBackend): The storage backend the store runs on.
+            calendar (LocalCalendar): The calendar of the user's timezone.
+        """
+
+    def __init__(self, db):
+        """
+               Initialize a HabitStore instance.
+
+               Parameters:
+                   db: The storage backend or database connection object.
+               """
+        self.db = db
+        self.backend = get_backend(db)
+        self._ids = {}
+        self._index = None
+        self._risk = None
+        self.calendar = calendar_for(self.backend.timezone())
+
+
+    @instrument
+    def names(self, periodicity=None):
+        """
+                Retrieve the names of all habits, or of the habits with the given periodicity.
+
+                Parameters:
+                    periodicity (str, optional): The periodicity to filter by.
+
+                Returns:
+                    List[str]: A list of habit names.
+                """
+        return self.backend.habit_names(periodicity)
+
+
+    @instrument
+    def count_habits(self):
+        """
+                Return the number of habits in the database.
+                """
+        return self.backend.count_habits()
+
+
+    def index(self):
+        """
+                Return the search index over the habits, building it on first use.
+
+                Returns:
+                    HabitIndex: The search index.
+                """
+        if self._index is None:
+            self._index = HabitIndex.from_db(self.backend)
+        return self._index
+
+
+    def menu_names(self, limit=SELECT_MENU_LIMIT):
+        """
+                Return the habit names to choose from in a menu, or None if there are more than `limit`
+                habits and they should be searched instead. This takes at most one query, and none once
+                the search index is built and already holds more than `limit` habits.
+
+                Parameters:
+                    limit (int): The largest number of habits listed in a menu, SELECT_MENU_LIMIT by default.
+
+                Returns:
+                    List[str]: The habit names, empty if there are no habits, or None.
+                """
+        if self._index is not None and len(self._index) > limit:
+            return None
+        names = self.names()
+        if len(names) > limit:
+            # Built before the prompt opens, so the first keystroke is as fast as the next ones
+            self.index()
+            return None
+        return names
+
+
+    @instrument
+    def search(self, query, offset=0, limit=20):
+        """
+                Find habits by name or description for type-ahead selection.
+
+                Parameters:
+                    query (str): The text typed so far.
+                    offset (int): The number of matches to skip.
+                    limit (int): The maximum number of matches to return.
+
+                Returns:
+                    List[str]: The names of the matching habits.
+                """
+        return self.index().search(query, offset, limit)
+
+
+    def risk(self):
+        """
+                Return the risk scoring engine, building it on first use.
+
+                Returns:
+                    RiskEngine: The risk scoring engine.
+                """
+        if self._risk is None:
+            self._risk = RiskEngine(self.backend)
+        return self._risk
+
+
+    @instrument
+    def at_risk(self, threshold=0.5, at=None):
+        """
+                Find the habits that are likely to break their streak today.
+
+                Parameters:
+                    threshold (float): The minimum risk score, between 0 and 1.
+                    at (datetime, optional): The local time to score for. Defaults to now in the user's timezone.
+
+                Returns:
+                    List[Tuple[str, float]]: (name, score) pairs, riskiest first.
+                """
+        return self.risk().at_risk(threshold, at)
+
+
+    @instrument
+    def habit_id(self, name):
+        """
+                Return the database ID of a habit, from the cache if possible.
+
+                Parameters:
+                    name (str): The name of the habit.
+
+                Returns:
+                    Optional[int]: The ID of the habit, or None if it does not exist.
+                """
+        habit_id = self._ids.get(name)
+        if habit_id is None:
+            habit_id = self.backend.habit_id(name)
+            if habit_id is not None:
+                self._ids[name] = habit_id
+        return habit_id
+
+
+    @instrument
+    def add_habit(self, name, description, periodicity):
+        """
+                Save a new habit to the database.
+
+                Parameters:
+                    name (str): The name of the habit.
+                    description (str): A brief description of the habit.
+                    periodicity (str): The schedule of the habit, e.g. daily, weekly or 3 per week.
+
+                Returns:
+                    int: The ID of the newly created habit in the database.
+
+                Raises:
+                    ValueError: If the periodicity is not a valid schedule.
+                """
+        periodicity = normalize_schedule(periodicity)
+        creation_date = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        habit_id = self._ids[name] = self.backend.add_habit(name, description, periodicity, creation_date)
+        if self._index is not None:
+            self._index.add(name, description)
+        return habit_id
+
+
+    @instrument
+    def check_in(self, name, increment_date=None):
+        """
+                Increment the counter of a habit with a single statement.
+
+                Parameters:
+                    name (str): The name of the habit.
+                    increment_date (datetime, optional): The date and time of the increment, in the
+                                                         user's timezone if it is naive.
+                                                         Defaults to the current time.
+
+                Raises:
+                    ValueError: If the habit does not exist.
+                """
+        timestamp = self.calendar.timestamp(increment_date)
+        current_time = self.calendar.format(timestamp)
+        habit_id = self._ids.get(name)
+        if habit_id is not None:
+            self.backend.add_check_in(habit_id, current_time, timestamp)
+        elif not self.backend.check_in_by_name(name, current_time, timestamp):
+            raise ValueError(f"Habit with name '{name}' not found.")
+
+
+    @instrument
+    def set_timezone(self, name):
+        """
+                Change the timezone the user's check-ins are counted in.
+
+                Parameters:
+                    name (str): The IANA name of the timezone, e.g. "America/New_York".
+
+                Raises:
+                    ValueError: If the timezone is unknown.
+                """
+        self.backend.set_timezone(name)
+        self.calendar = calendar_for(name)
+        # Local days have moved, so the risk features are rebuilt on next use
+        self._risk = None
+
+
+    @instrument
+    def count(self, name):
+        """
+                Return the number of times a habit has been checked off.
+
+                Parameters:
+                    name (str): The name of the habit.
+
+                Returns:
+                    int: The number of check-ins, 0 if the habit does not exist.
+                """
+        habit_id = self._ids.get(name)
+        if habit_id is not None:
+            return self.backend.count_check_ins(habit_id)
+        return self.backend.count_check_ins_by_name(name)
+
+
+    @instrument
+    def reset(self, name):
+        """
+                Remove all check-ins of a habit with a single statement.
+
+                Parameters:
+                    name (str): The name of the habit.
+                """
+        habit_id = self._ids.get(name)
+        if habit_id is not None:
+            self.backend.delete_check_ins(habit_id)
+        else:
+            self.backend.delete_check_ins_by_name(name)
+
+
+    @instrument
+    def delete(self, name):
+        """
+                Delete a habit and its check-ins from the database.
+
+                Parameters:
+                    name (str): The name of the habit.
+                """
+        habit_id = self._ids.pop(name, None)
+        if habit_id is not None:
+            self.backend.delete_habit(habit_id)
+        else:
+            self.backend.delete_habit_by_name(name)
+        if self._index is not None:
+            self._index.remove(name)
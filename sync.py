@@ -0,0 +1,222 @@
+import json
+from profiling import instrument
+import queries
+from timezones import calendar_for
+
+# Operations of a delta. Every operation is a list starting with one of these codes:
+#   ["h", name, description, periodicity, creation_date]          the habit exists
+#   ["c", uid, habit_name, increment_date, origin, increment_ts]  the check-in exists
+#   ["r", uid]                                                    the check-in was removed
+#   ["d", name]                                                   the habit was deleted
+HABIT, CHECK_IN, REMOVED, DELETED = "h", "c", "r", "d"
+
+
+def device_id(db):
+    """
+    Return the ID that identifies a database file to its sync peers.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+
+    Returns:
+    -------
+    str
+        The device ID.
+    """
+    return db.execute(queries.SELECT_DEVICE_ID).fetchone()[0]
+
+
+def sync_vector(db):
+    """
+    Describe what a database already has, so a peer can send only what is missing.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+
+    Returns:
+    -------
+    dict
+        The device ID of the database and, for every peer it has synced with, the last
+        change log sequence number of that peer it has applied.
+    """
+    return {"device_id": device_id(db), "seen": dict(db.execute(queries.SELECT_SYNC_PEERS).fetchall())}
+
+
+def start_as_new_device(db, last_seq=0):
+    """
+    Give a database a new device ID and forget what it has applied from its peers, so the next sync
+    with every peer is a full exchange. This is needed once a database has been restored from a
+    backup: its change log numbers again from where the backup was taken, and peers would skip the
+    changes that reuse numbers they have already applied.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+    last_seq : int
+        The highest change log sequence number handed out before, new changes are numbered after it.
+    """
+    db.execute(queries.RESET_DEVICE_ID)
+    db.execute(queries.DELETE_SYNC_PEERS)
+    db.execute(queries.UPDATE_CHANGE_SEQUENCE, (last_seq,))
+    db.execute(queries.INSERT_CHANGE_SEQUENCE, (last_seq,))
+    db.commit()
+
+
+def _snapshot(db):
+    """
+    Return the operations that recreate the whole content of a database, including removals.
+    """
+    operations = [[HABIT, *row] for row in db.execute(queries.SELECT_ALL_HABITS_FOR_SYNC)]
+    operations += [[CHECK_IN, uid, name, increment_date, origin, increment_ts]
+                   for name, uid, increment_date, origin, increment_ts
+                   in db.execute(queries.SELECT_ALL_CHECK_INS_FOR_SYNC)]
+    operations += [[REMOVED, row[0]] for row in db.execute(queries.SELECT_ALL_REMOVED_CHECK_INS)]
+    return operations
+
+
+def _changes(db, since, until, peer):
+    """
+    Return the operations for the change log entries in (since, until], leaving out check-ins the peer made itself.
+    """
+    operations = []
+    names = {}
+    deleted = {}
+    changes = db.execute(queries.SELECT_SYNC_CHANGES, (since, until))
+    for operation, name, uid, increment_date, origin, increment_ts in changes:
+        if name is not None:
+            names[name] = None
+        if operation == "check_in_added":
+            # No increment date means the check-in has been removed again, a later entry says so
+            if increment_date is not None and origin != peer:
+                operations.append([CHECK_IN, uid, name, increment_date, origin, increment_ts])
+        elif operation == "check_in_removed":
+            if uid is not None:
+                operations.append([REMOVED, uid])
+        elif operation == "habit_deleted":
+            deleted[name] = None
+
+    habits = {name: db.execute(queries.SELECT_HABIT_FOR_SYNC, (name,)).fetchone() for name in names}
+    # The habits come first, so the peer can file the check-ins under them, and the deletions last,
+    # leaving out habits that have been added again since they were deleted
+    return ([[HABIT, *habit] for habit in habits.values() if habit is not None]
+            + operations
+            + [[DELETED, name] for name in deleted if habits[name] is None])
+
+
+@instrument
+def export_delta(db, vector):
+    """
+    Collect the changes a peer has not seen yet. Only the change log entries after the peer's
+    last sync are read, so the size of the delta follows the number of changes rather than the
+    size of the history. A full snapshot is sent on the first sync with a peer, or if the
+    entries the peer needs have already been pruned from the change log.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+    vector : dict
+        The sync vector of the peer, as returned by `sync_vector`.
+
+    Returns:
+    -------
+    dict
+        The delta, to be passed to `apply_delta` on the peer.
+    """
+    own_id = device_id(db)
+    since = vector["seen"].get(own_id, 0)
+    until = db.execute(queries.SELECT_LAST_CHANGE_SEQ).fetchone()[0]
+    first = db.execute(queries.SELECT_FIRST_CHANGE_SEQ).fetchone()[0]
+
+    if since == 0 or (first and since < first - 1):
+        operations = _snapshot(db)
+    else:
+        operations = _changes(db, since, until, vector["device_id"])
+    return {"device_id": own_id, "seq": until, "operations": operations}
+
+
+@instrument
+def apply_delta(db, delta):
+    """
+    Merge a delta from a peer in a single transaction. Merging is idempotent and the result does
+    not depend on the order in which deltas arrive: check-ins are identified by their stable IDs,
+    a removal always wins over the same check-in arriving again, and a deleted habit is kept if a
+    check-in made elsewhere still refers to it.
+
+    Parameters:
+    ----------
+    db : sqlite3.Connection
+        The database connection object.
+    delta : dict
+        The delta, as returned by `export_delta` on the peer.
+    """
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        calendar = calendar_for(db.execute(queries.SELECT_TIMEZONE).fetchone()[0])
+        for operation in delta["operations"]:
+            code = operation[0]
+            if code == HABIT:
+                db.execute(queries.INSERT_SYNCED_HABIT, operation[1:])
+            elif code == CHECK_IN:
+                # Peers from before check-in timestamps send no increment_ts
+                _, uid, name, increment_date, origin, *increment_ts = operation
+                increment_ts = increment_ts[0] if increment_ts else None
+                if increment_ts is not None:
+                    # The peer wrote the date string in its own timezone
+                    increment_date = calendar.format(increment_ts)
+                db.execute(queries.INSERT_SYNCED_CHECK_IN, (increment_date, increment_ts, uid, origin, name, uid))
+            elif code == REMOVED:
+                db.execute(queries.INSERT_REMOVED_CHECK_IN, (operation[1],))
+                db.execute(queries.DELETE_COUNTER_BY_UID, (operation[1],))
+            elif code == DELETED:
+                db.execute(queries.DELETE_EMPTY_HABIT_BY_NAME, (operation[1],))
+        db.execute(queries.UPSERT_SYNC_PEER, (delta["device_id"], delta["seq"]))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def encode_delta(delta):
+    """
+    Serialize a delta for transfer.
+    """
+    return json.dumps(delta, separators=(",", ":")).encode("utf-8")
+
+
+def decode_delta(data):
+    """
+    Deserialize a delta produced by `encode_delta`.
+    """
+    return json.loads(data.decode("utf-8"))
+
+
+@instrument
+def sync(db_a, db_b):
+    """
+    Synchronize two databases in both directions, as two devices would over the network.
+
+    Parameters:
+    ----------
+    db_a : sqlite3.Connection
+        The database connection object of the first device.
+    db_b : sqlite3.Connection
+        The database connection object of the second device.
+
+    Returns:
+    -------
+    Tuple[int, int]
+        The number of bytes sent from a to b and from b to a.
+    """
+    to_b = encode_delta(export_delta(db_a, sync_vector(db_b)))
+    apply_delta(db_b, decode_delta(to_b))
+    to_a = encode_delta(export_delta(db_b, sync_vector(db_a)))
+    apply_delta(db_a, decode_delta(to_a))
+    return len(to_b), len(to_a)
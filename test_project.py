@@ -1,9 +1,31 @@
 from datetime import datetime, timedelta
 from habit import Habit
-from analyse import get_longest_streak, get_longest_streak_all_habits
-from db import get_habits_list, get_habits_by_periodicity, get_counter, get_db
+from analyse import get_longest_streak, get_longest_streak_all_habits, get_dashboard
+from db import (get_habits_list, get_habits_by_periodicity, get_counter, get_db, changes_since, last_change_seq,
+                get_timezone)
+from storage import MemoryBackend, StorageBackend, SCHEMA_VERSION, ensure_schema, get_backend
 from db_example_db import preload_example_data
+import json
+import profiling
+import queries
+import os
 import sqlite3
+import subprocess
+import sys
+import time
+import pytest
+from store import HabitStore
+from search import HabitIndex
+import sync
+from risk import RiskEngine
+from schedule import compile_schedule
+import timezones
+from timezones import calendar_for
+from report import get_activity, render_report, render_habit, export_html, export_svg
+from durability import backup, restore
+from collections import Counter
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
 
 
 def setup_test_database():
@@ -269,6 +291,796 @@ def test_get_longest_streak_all_habits():
     db.close()
 
 
+def test_profiling_disabled_records_nothing():
+    """
+    Test that instrumented functions do not record metrics while profiling is disabled.
+    """
+    db = setup_test_database()
+    profiling.disable()
+    profiling.reset()
+
+    get_habits_list(db)
+    get_longest_streak(db, "Reading")
+
+    assert profiling.snapshot()["functions"] == {}
+
+    db.close()
+
+
+def test_profiling_records_calls_and_statements():
+    """
+    Test that enabled profiling records call counts, latencies and SQLite statements, and exports them.
+    """
+    db = setup_test_database()
+    profiling.reset()
+    profiling.instrument_connection(db)
+    profiling.enable()
+    try:
+        get_habits_list(db)
+        get_habits_list(db)
+        habit = Habit.get_by_name(db, "Reading")
+        habit.increment(db)
+    finally:
+        profiling.disable()
+
+    metrics = profiling.snapshot()
+    assert metrics["functions"]["db.get_habits_list"]["calls"] == 2
+    assert sum(metrics["functions"]["db.get_habits_list"]["buckets"]) == 2
+    assert metrics["functions"]["habit.Habit.get_by_name"]["calls"] == 1
+    assert metrics["functions"]["habit.Habit.increment"]["calls"] == 1
+    assert metrics["statements"]["SELECT name FROM habits"]["calls"] == 2
+
+    assert json.loads(profiling.export_json())["functions"]["db.get_habits_list"]["calls"] == 2
+    prometheus = profiling.export_prometheus()
+    assert 'habit_call_seconds_count{function="db.get_habits_list"} 2' in prometheus
+    assert 'habit_call_seconds_bucket{function="db.get_habits_list",le="+Inf"} 2' in prometheus
+
+    profiling.reset()
+    db.close()
+
+
+def test_habit_store_check_in_and_reset():
+    """
+    Test checking off and resetting habits through the HabitStore, with and without a cached habit id.
+    """
+    db = setup_test_database()
+    store = HabitStore(db)
+
+    # Without a cached id the lookup and the insert run as one statement
+    statements = []
+    db.set_trace_callback(statements.append)
+    store.check_in("Reading", datetime(2024, 11, 16, 20, 0, 0))
+    db.set_trace_callback(None)
+    # The trace callback reports the statement again for every trigger it fires, hence the set
+    assert len({sql for sql in statements if sql.startswith("INSERT")}) == 1
+    assert not any(sql.startswith("SELECT") for sql in statements)
+    assert store.count("Reading") == 13
+    assert get_longest_streak(db, "Reading") == 6
+
+    # With a cached id the counter is inserted directly
+    assert store.habit_id("Cleaning") is not None
+    store.check_in("Cleaning")
+    assert get_counter(db, "Cleaning") == 5
+
+    store.reset("Reading")
+    assert store.count("Reading") == 0
+
+    with pytest.raises(ValueError):
+        store.check_in("Non-Existent Habit")
+
+    db.close()
+
+
+def test_habit_store_add_and_delete():
+    """
+    Test adding and deleting habits through the HabitStore, including the id cache.
+    """
+    db = setup_test_database()
+    store = HabitStore(db)
+
+    habit_id = store.add_habit("Stretching", "Stretch for 10 minutes", "daily")
+    assert store.habit_id("Stretching") == habit_id
+    assert "Stretching" in store.names()
+    assert store.names("weekly") == ["Cleaning"]
+
+    store.check_in("Stretching")
+    store.delete("Stretching")
+    assert store.habit_id("Stretching") is None
+    assert "Stretching" not in get_habits_list(db)
+    cursor = db.cursor()
+    cursor.execute('SELECT COUNT(*) FROM counters WHERE habit_id = ?', (habit_id,))
+    assert cursor.fetchone()[0] == 0
+
+    # Deleting a habit that was never looked up removes its counters by name
+    store.delete("Reading")
+    assert get_counter(db, "Reading") == 0
+    assert "Reading" not in get_habits_list(db)
+
+    db.close()
+
+
+def test_habit_index_prefix_and_pagination():
+    """
+    Test prefix lookups over habit names and descriptions, one page at a time.
+    """
+    db = setup_test_database()
+    index = HabitIndex.from_db(db)
+
+    assert len(index) == 5
+    assert index.prefix("rea") == ["Reading"]
+    assert index.prefix("the") == ["Cleaning", "Make the bed", "Play the guitar"]
+    # "pages" only appears in the description of Reading
+    assert index.prefix("pages") == ["Reading"]
+    assert index.prefix("make bed") == ["Make the bed"]
+
+    all_habits = index.prefix("", limit=10)
+    assert len(all_habits) == 5
+    assert index.prefix("", offset=0, limit=2) + index.prefix("", offset=2, limit=3) == all_habits
+
+    db.close()
+
+
+def test_habit_index_fuzzy_and_updates():
+    """
+    Test typo-tolerant search and keeping the index in step with the store.
+    """
+    db = setup_test_database()
+    store = HabitStore(db)
+
+    assert store.search("guitra")[0] == "Play the guitar"
+    assert store.index().fuzzy("protien shake", limit=1) == ["Drink a protein shake"]
+
+    store.add_habit("Guitar theory", "Learn one chord a day", "daily")
+    assert store.search("guitar") == ["Guitar theory", "Play the guitar"]
+    assert store.search("chord") == ["Guitar theory"]
+
+    store.delete("Play the guitar")
+    assert "Play the guitar" not in store.index()
+    assert store.search("play") == []
+
+    db.close()
+
+
+def test_menu_names_in_one_query():
+    """
+    Test that choosing between a list and search takes a single query, and none once the index is built.
+    """
+    db = setup_test_database()
+    store = HabitStore(db)
+    habits = get_habits_list(db)
+    statements = []
+    db.set_trace_callback(statements.append)
+
+    assert sorted(store.menu_names()) == sorted(habits)
+    assert len(statements) == 1
+    assert store.menu_names(limit=2) is None
+    assert len(statements) == 3
+    # The index was built for the search, and now answers for the size of the catalog
+    assert store.menu_names(limit=2) is None
+    assert len(statements) == 3
+
+    db.set_trace_callback(None)
+    assert HabitStore(MemoryBackend()).menu_names() == []
+    db.close()
+
+
+def test_get_dashboard():
+    """
+    Test that the dashboard returns the statistics of every habit with a single query.
+    """
+    db = setup_test_database()
+    today = datetime(2024, 11, 18).date()
+
+    statements = []
+    db.set_trace_callback(statements.append)
+    dashboard = get_dashboard(db, today)
+    db.set_trace_callback(None)
+    # One read of the user's timezone and one of every habit with its check-ins
+    assert len(statements) == 2
+
+    habits = {entry["name"]: entry for entry in dashboard}
+    assert set(habits) == set(get_habits_list(db))
+    for name, entry in habits.items():
+        assert entry["count"] == get_counter(db, name)
+        assert entry["longest_streak"] == get_longest_streak(db, name)
+
+    # Make the bed was checked off on 17/11 and 18/11, Reading last on 15/11
+    assert habits["Make the bed"]["current_streak"] == 2
+    assert habits["Make the bed"]["last_check_in"] == datetime(2024, 11, 18, 9, 10, 15)
+    assert habits["Reading"]["current_streak"] == 0
+    # Reading was checked off on 12 of the 18 days since 01/11
+    assert habits["Reading"]["completion_rate"] == 12 / 18
+
+    # A habit without check-ins is still listed
+    Habit(name="Empty Habit", description="No increments", periodicity="daily").save_to_db(db)
+    empty = [entry for entry in get_dashboard(db, today) if entry["name"] == "Empty Habit"][0]
+    assert empty["count"] == 0
+    assert empty["longest_streak"] == 0
+    assert empty["last_check_in"] is None
+
+    db.close()
+
+
+def test_schema_setup_runs_once(tmp_path):
+    """
+    Test that the schema is created the first time a file is opened and only checked afterwards.
+    """
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    assert db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    db.close()
+
+    db = get_db(path)
+    statements = []
+    db.set_trace_callback(statements.append)
+    ensure_schema(db)
+    db.set_trace_callback(None)
+    assert statements == ["PRAGMA user_version"]
+    db.close()
+
+
+def test_schema_upgrades_unversioned_database(tmp_path):
+    """
+    Test that a database created before schema versioning keeps its data and gains the indexes.
+    """
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE habits (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, description TEXT, "
+               "periodicity TEXT NOT NULL, creation_date TEXT)")
+    db.execute("CREATE TABLE counters (id INTEGER PRIMARY KEY, habit_id INTEGER, increment_date TEXT)")
+    db.execute("INSERT INTO habits (name, description, periodicity) VALUES ('Old habit', '', 'daily')")
+    db.execute("INSERT INTO counters (habit_id, increment_date) VALUES (1, '18/11/2024 08:00:00')")
+    db.commit()
+    db.close()
+
+    db = get_db(path)
+    assert get_habits_list(db) == ["Old habit"]
+    indexes = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    assert "idx_counters_habit_id" in indexes
+    # The check-in is pinned to the moment its local date string meant on this machine
+    increment_ts = db.execute("SELECT increment_ts FROM counters").fetchone()[0]
+    assert increment_ts == calendar_for(get_timezone(db)).parse("18/11/2024 08:00:00")
+    db.close()
+
+
+def test_memory_backend_matches_sqlite():
+    """
+    Test that the in-memory backend gives the same results as SQLite for every public function.
+    """
+    results = []
+    for db in (sqlite3.connect(':memory:'), MemoryBackend()):
+        preload_example_data(db)
+
+        habit = Habit(name="Backend Habit", description="Runs on every backend", periodicity="daily")
+        habit.save_to_db(db)
+        for days_ago in range(3):
+            habit.increment(db, datetime(2024, 11, 20) - timedelta(days=days_ago))
+        Habit.get_by_name(db, "Reading").reset(db)
+        Habit.get_by_name(db, "Make the bed").delete(db)
+
+        store = HabitStore(db)
+        store.check_in("Cleaning", datetime(2024, 12, 5))
+        # Every backend rejects the same mistakes with the same error
+        with pytest.raises(ValueError):
+            get_backend(db).add_habit("Cleaning", "", "weekly", None)
+        with pytest.raises(ValueError):
+            get_backend(db).add_habit(None, "", "weekly", None)
+
+        names = sorted(get_habits_list(db))
+        results.append((
+            names,
+            get_habits_by_periodicity(db, "weekly"),
+            [get_counter(db, name) for name in names],
+            [get_longest_streak(db, name) for name in names],
+            get_longest_streak_all_habits(db),
+            get_dashboard(db, datetime(2024, 12, 6).date()),
+            store.search("guit"),
+        ))
+
+    assert results[0] == results[1]
+    assert results[1][0] == ["Backend Habit", "Cleaning", "Drink a protein shake", "Play the guitar", "Reading"]
+    assert results[1][2] == [3, 5, 15, 12, 0]
+    assert results[1][3][0] == 3
+
+    class IncompleteBackend(StorageBackend):
+        def initialize(self):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
+
+
+def test_change_log_records_every_write():
+    """
+    Test that adding, checking off, resetting and deleting habits is recorded in the change log on every backend.
+    """
+    for db in (sqlite3.connect(':memory:'), MemoryBackend()):
+        preload_example_data(db)
+        seq = last_change_seq(db)
+
+        habit = Habit(name="Logged Habit", description="Every write is logged", periodicity="daily")
+        habit.save_to_db(db)
+        habit.increment(db, datetime(2024, 11, 20, 8, 0, 0))
+        habit.increment(db, datetime(2024, 11, 21, 8, 0, 0))
+        habit.reset(db)
+        habit.increment(db, datetime(2024, 11, 22, 8, 0, 0))
+        habit.delete(db)
+
+        changes = changes_since(db, seq)
+        assert [change["operation"] for change in changes] == [
+            "habit_added",
+            "check_in_added", "check_in_added",
+            "check_in_removed", "check_in_removed",
+            "check_in_added",
+            "check_in_removed", "habit_deleted",
+        ]
+        assert all(change["habit_name"] == "Logged Habit" for change in changes)
+        assert changes[1]["increment_date"] == "20/11/2024 08:00:00"
+        assert [change["seq"] for change in changes] == list(range(seq + 1, seq + 9))
+
+        # Consumers page through the log by passing the last sequence number they saw
+        first_page = changes_since(db, seq, limit=3)
+        second_page = changes_since(db, first_page[-1]["seq"], limit=100)
+        assert first_page + second_page == changes
+        assert changes_since(db, last_change_seq(db)) == []
+
+
+def test_change_log_retention():
+    """
+    Test that the change log only keeps the most recent changes.
+    """
+    backend = MemoryBackend(retention=10)
+    habit_id = backend.add_habit("Busy Habit", "", "daily", None)
+    backend.add_check_ins((habit_id, f"{day:02d}/11/2024 08:00:00") for day in range(1, 31))
+    assert last_change_seq(backend) == 31
+    assert 10 <= len(changes_since(backend, 0, limit=100)) < 20
+    assert changes_since(backend, 30)[0]["increment_date"] == "30/11/2024 08:00:00"
+
+    db = sqlite3.connect(':memory:')
+    preload_example_data(db)
+    habit_id = Habit.get_by_name(db, "Reading").id
+    db.executemany(queries.INSERT_COUNTER, ((habit_id, "01/12/2024 08:00:00")
+                                            for _ in range(queries.CHANGE_LOG_RETENTION)))
+    db.commit()
+    changes = changes_since(db, 0, limit=queries.CHANGE_LOG_RETENTION + 100)
+    assert len(changes) == queries.CHANGE_LOG_RETENTION
+    assert changes[-1]["seq"] == last_change_seq(db)
+    db.close()
+
+
+def check_ins_by_habit(db):
+    """
+    Return the check-ins of every habit as sorted (habit, uid, increment date) tuples.
+    """
+    return sorted(db.execute("SELECT habits.name, counters.uid, counters.increment_date "
+                             "FROM counters JOIN habits ON habits.id = counters.habit_id"))
+
+
+def test_sync_converges_with_small_deltas(tmp_path):
+    """
+    Test that two devices converge, and that later syncs only send what changed.
+    """
+    phone = get_db(str(tmp_path / "phone.db"))
+    laptop = get_db(str(tmp_path / "laptop.db"))
+    preload_example_data(phone)
+    assert sync.device_id(phone) != sync.device_id(laptop)
+
+    first = sync.sync(phone, laptop)
+    assert sorted(get_habits_list(laptop)) == sorted(get_habits_list(phone))
+    assert check_ins_by_habit(laptop) == check_ins_by_habit(phone)
+
+    # Both devices check in while offline, then sync
+    Habit.get_by_name(phone, "Reading").increment(phone, datetime(2024, 12, 1, 8, 0, 0))
+    HabitStore(laptop).check_in("Cleaning", datetime(2024, 12, 2, 9, 0, 0))
+    second = sync.sync(phone, laptop)
+    assert second[0] * 10 < first[0] and second[1] * 10 < first[0]
+    assert get_counter(laptop, "Reading") == get_counter(phone, "Reading") == 13
+    assert get_counter(laptop, "Cleaning") == get_counter(phone, "Cleaning") == 5
+    assert check_ins_by_habit(laptop) == check_ins_by_habit(phone)
+
+    # Applying the same delta again changes nothing
+    delta = sync.export_delta(phone, {"device_id": "elsewhere", "seen": {}})
+    before = check_ins_by_habit(laptop)
+    sync.apply_delta(laptop, delta)
+    sync.apply_delta(laptop, delta)
+    assert check_ins_by_habit(laptop) == before
+    phone.close()
+    laptop.close()
+
+
+def test_sync_merges_removals_and_deletions(tmp_path):
+    """
+    Test that resets propagate, and that a habit deleted on one device survives a concurrent check-in on the other.
+    """
+    phone = get_db(str(tmp_path / "phone.db"))
+    laptop = get_db(str(tmp_path / "laptop.db"))
+    preload_example_data(phone)
+    sync.sync(phone, laptop)
+
+    Habit.get_by_name(laptop, "Reading").reset(laptop)
+    Habit.get_by_name(phone, "Cleaning").delete(phone)
+    Habit.get_by_name(phone, "Make the bed").delete(phone)
+    HabitStore(laptop).check_in("Cleaning", datetime(2024, 12, 2, 9, 0, 0))
+    sync.sync(phone, laptop)
+    sync.sync(phone, laptop)
+
+    for db in (phone, laptop):
+        assert get_counter(db, "Reading") == 0
+        assert get_counter(db, "Cleaning") == 1
+        assert "Make the bed" not in get_habits_list(db)
+    assert check_ins_by_habit(laptop) == check_ins_by_habit(phone)
+
+    # A check-in removed on one device is not brought back by a stale copy from another
+    stale = sync.export_delta(phone, {"device_id": "elsewhere", "seen": {}})
+    Habit.get_by_name(phone, "Cleaning").reset(phone)
+    sync.sync(phone, laptop)
+    sync.apply_delta(laptop, stale)
+    assert get_counter(laptop, "Cleaning") == 0
+    phone.close()
+    laptop.close()
+
+
+def test_risk_scores_and_cache():
+    """
+    Test that habits due today score by how late and how typical a break it is, and that scores are cached until a write.
+    """
+    db = setup_test_database()
+    store = HabitStore(db)
+    at = datetime(2024, 11, 16, 12, 0, 0)
+    scores = dict(store.risk().scores(at))
+
+    # The shake is usually drunk by 8 am, the guitar is played in the evening
+    assert scores["Drink a protein shake"] > scores["Play the guitar"] > 0.5
+    assert scores["Make the bed"] == 0.0  # already checked off on a later day
+    assert scores["Cleaning"] < 0.05
+    assert [name for name, _ in store.at_risk(at=at)] == ["Drink a protein shake", "Reading", "Play the guitar"]
+    assert dict(store.risk().scores(datetime(2024, 11, 30, 12, 0, 0)))["Reading"] == 1.0
+
+    statements = []
+    db.set_trace_callback(statements.append)
+    assert store.risk().scores(at) == scores
+    assert len(statements) == 1 and statements[0].startswith("SELECT seq")
+
+    store.check_in("Drink a protein shake", datetime(2024, 11, 16, 7, 30, 0))
+    updated = store.risk().scores(at)
+    db.set_trace_callback(None)
+    assert updated["Drink a protein shake"] == 0.0
+    assert {name: updated[name] for name in scores if name != "Drink a protein shake"} == \
+           {name: scores[name] for name in scores if name != "Drink a protein shake"}
+    db.close()
+
+
+def test_risk_engine_follows_writes():
+    """
+    Test that features kept current from the change log match features rebuilt from scratch on every backend.
+    """
+    at = datetime(2024, 11, 19, 9, 0, 0)
+    for db in (setup_test_database(), MemoryBackend()):
+        if isinstance(db, MemoryBackend):
+            preload_example_data(db)
+        store = HabitStore(db)
+        engine = store.risk()
+        engine.scores(at)
+
+        store.check_in("Reading", datetime(2024, 11, 16, 21, 0, 0))
+        store.check_in("Reading", datetime(2024, 11, 10, 21, 0, 0))  # out of order
+        store.reset("Play the guitar")
+        store.delete("Make the bed")
+        store.add_habit("New Habit", "Added after the engine was built", "weekly")
+        store.check_in("New Habit", datetime(2024, 11, 18, 9, 0, 0))
+
+        assert engine.scores(at) == RiskEngine(db).scores(at)
+        assert "Make the bed" not in engine.scores(at)
+        assert engine.scores(at)["Play the guitar"] == 0.0
+
+
+def test_risk_scores_in_the_user_timezone(monkeypatch):
+    """
+    Test that habits are scored on the date of the user's timezone, not the one of the machine.
+    """
+    # The clock reads 03:00 UTC on 20/11/2024, which is still the evening of 19/11 in Los Angeles
+    now = datetime.fromisoformat("2024-11-20T03:00:00+00:00").timestamp()
+    monkeypatch.setattr(timezones, "time", SimpleNamespace(time=lambda: now))
+    db = sqlite3.connect(':memory:')
+    preload_example_data(db)
+    store = HabitStore(db)
+    store.set_timezone("America/Los_Angeles")
+    store.add_habit("Morning run", "", "daily")
+    store.check_in("Morning run")
+    assert get_backend(db).history("Morning run")[0][0] == "19/11/2024 19:00:00"
+    # Checked off today where the user is, so the streak is not at risk
+    assert dict(store.at_risk(threshold=0.0))["Morning run"] == 0.0
+    # A day later it is
+    assert dict(store.at_risk(threshold=0.0, at=datetime(2024, 11, 20, 19, 0)))["Morning run"] > 0.0
+
+
+def test_app_starts_without_a_time_zone_database(tmp_path):
+    """
+    Test that a database can be opened in UTC on a machine without a time zone database, as on Windows without tzdata.
+    """
+    script = ("import sys; sys.modules['tzdata'] = None\n"
+              "from db import get_db, get_timezone\n"
+              "from storage import MemoryBackend\n"
+              "db = get_db(sys.argv[1])\n"
+              "print(get_timezone(db), MemoryBackend().timezone())")
+    env = dict(os.environ, PYTHONTZPATH=str(tmp_path), TZ="", PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", script, str(tmp_path / "habits.db")],
+                            env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["UTC", "UTC"]
+
+
+def test_check_ins_are_counted_in_the_user_timezone():
+    """
+    Test that check-ins fall on the local day of the user's timezone, across DST and timezone changes.
+    """
+    for db in (sqlite3.connect(':memory:'), MemoryBackend()):
+        preload_example_data(db)
+        store = HabitStore(db)
+        store.set_timezone("America/New_York")
+        store.add_habit("Late run", "", "daily")
+        store.add_habit("Old run", "", "daily")
+        # Written without a timestamp, as older versions did, so the date string is read as it is
+        get_backend(db).check_in_by_name("Old run", "11/03/2024 23:30:00")
+        # New York moves to daylight saving time at 02:00 on 10/03/2024
+        for moment in ("2024-03-10T04:30:00+00:00", "2024-03-10T13:00:00+00:00", "2024-03-12T03:59:00+00:00"):
+            store.check_in("Late run", datetime.fromisoformat(moment))
+
+        assert get_counter(db, "Late run") == 3
+        assert get_longest_streak(db, "Late run") == 3
+        dashboard = {entry["name"]: entry for entry in get_dashboard(db, datetime(2024, 3, 12).date())}
+        assert dashboard["Late run"]["current_streak"] == 3
+        assert dashboard["Late run"]["last_check_in"] == datetime(2024, 3, 11, 23, 59)
+        assert dashboard["Old run"]["last_check_in"] == datetime(2024, 3, 11, 23, 30)
+
+        # In Tokyo the first two check-ins fall on 10/03 and the last one on 12/03
+        store.set_timezone("Asia/Tokyo")
+        assert get_timezone(db) == "Asia/Tokyo"
+        assert get_longest_streak(db, "Late run") == 1
+        # The old check-in was pinned to its moment in New York before the switch
+        dashboard = {entry["name"]: entry for entry in get_dashboard(db, datetime(2024, 3, 12).date())}
+        assert dashboard["Old run"]["last_check_in"] == datetime(2024, 3, 12, 12, 30)
+        with pytest.raises(ValueError):
+            store.set_timezone("Mars/Olympus_Mons")
+        assert get_timezone(db) == "Asia/Tokyo"
+
+    calendar = calendar_for("America/New_York")
+    zone = ZoneInfo("America/New_York")
+    timestamps = range(0, 4102444800, 86400 * 7 + 3607)
+    assert calendar.days(timestamps) == [datetime.fromtimestamp(ts, zone).date().toordinal() for ts in timestamps]
+    assert calendar.format(1710052200) == "10/03/2024 01:30:00"
+    assert calendar.format(1710055800) == "10/03/2024 03:30:00"
+
+
+def test_activity_report_follows_writes():
+    """
+    Test that the weekly counts behind the reports follow check-ins, resets and timezone changes on every backend.
+    """
+    results = []
+    for db in (sqlite3.connect(':memory:'), MemoryBackend()):
+        preload_example_data(db)
+        store = HabitStore(db)
+        store.check_in("Cleaning", datetime(2024, 11, 20, 9, 0))
+        store.check_in("Cleaning", datetime(2024, 11, 20, 18, 0))
+        store.reset("Reading")
+        store.set_timezone("America/New_York")
+        store.check_in("Cleaning", datetime.fromisoformat("2024-11-21T03:30:00+00:00"))
+        store.set_timezone("Asia/Tokyo")
+
+        activity = get_activity(db, weeks=8, today=datetime(2024, 11, 24).date())
+        # The counts match the check-ins bucketed into local days one by one
+        calendar = calendar_for("Asia/Tokyo")
+        for habit in activity["habits"]:
+            days = calendar.check_in_days((row[0], row[2]) for row in get_backend(db).history(habit["name"]))
+            expected = Counter(day for day in days if activity["first_day"] <= day <= activity["today"])
+            counts = {7 * week + 1 + weekday: check_ins for week, row in habit["weeks"].items()
+                      for weekday, check_ins in enumerate(row) if check_ins}
+            assert counts == expected
+        results.append(activity)
+
+    assert results[0] == results[1]
+    assert [habit["name"] for habit in results[0]["habits"]] == get_habits_list(db)
+
+
+def test_activity_report_rendering(tmp_path):
+    """
+    Test that a report is read with a single query and rendered as heatmaps, sparklines, HTML and SVG.
+    """
+    db = setup_test_database()
+    HabitStore(db).check_in("Cleaning", datetime(2024, 11, 11, 18, 0))
+
+    statements = []
+    db.set_trace_callback(statements.append)
+    activity = get_activity(db, weeks=3, today=datetime(2024, 11, 17).date())
+    db.set_trace_callback(None)
+    # One read of the user's timezone and one of the weekly counts of every habit
+    assert len(statements) == 2
+
+    assert activity["first_day"] == datetime(2024, 10, 28).toordinal()
+    habits = {habit["name"]: habit for habit in activity["habits"]}
+    assert habits["Drink a protein shake"]["trend"] == [3 / 7, 1.0, 5 / 7]
+    assert habits["Cleaning"]["trend"] == [1.0, 1.0, 1.0]
+    assert sum(map(sum, habits["Reading"]["weeks"].values())) == 12
+
+    lines = render_habit(activity, "Cleaning").splitlines()
+    # Two check-ins on Monday 11/11 make it the busiest day
+    assert lines[3] == "Mon ··█"
+    assert lines[7] == "Fri ▒▒·"
+    assert lines[-1].strip().startswith("███")
+    report = render_report(activity).splitlines()
+    header = next(line for line in report if line.startswith("Habit"))
+    row = next(line for line in report if line.startswith("Drink a protein shake"))
+    # With only 3 weeks the averages still line up under their heading
+    assert len(row) == len(header) and row.endswith("%")
+    with pytest.raises(ValueError):
+        render_habit(activity, "Unknown habit")
+
+    page = open(export_html(activity, str(tmp_path / "report.html")), encoding="utf-8").read()
+    assert page.count("<svg") == 1 + 2 * len(habits)
+    # The page title and one tooltip per day of the heatmap of all habits
+    assert page.count("<title>") == 1 + 21
+    image = open(export_svg(activity, str(tmp_path / "cleaning.svg"), "Cleaning"), encoding="utf-8").read()
+    assert image.startswith("<svg") and image.count("<rect") == image.count("<title>") == 21
+    db.close()
+
+
+def test_durability_profiles(tmp_path):
+    """
+    Test that every durability profile sets up its journal and flushing, and that the relaxed
+    profile brings its commits into the database file with background checkpoints.
+    """
+    path = str(tmp_path / "habits.db")
+    for profile, synchronous in (("strict", 2), ("normal", 1), ("relaxed", 0)):
+        db = get_db(path, profile, checkpoint_interval=0.01)
+        assert db.durability == profile
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == synchronous
+        assert (db.checkpointer is not None) == (profile == "relaxed")
+        store = HabitStore(db)
+        store.add_habit(f"Habit {profile}", "", "daily")
+        store.check_in(f"Habit {profile}", datetime(2024, 11, 20, 9, 0))
+        if profile == "relaxed":
+            checkpointer = db.checkpointer
+            checkpoints = checkpointer.checkpoints
+            deadline = time.monotonic() + 5
+            while checkpointer.checkpoints < checkpoints + 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # Everything in the log has been copied into the database file
+            _, log_frames, checkpointed = db.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            assert log_frames == checkpointed
+        db.close()
+        if profile == "relaxed":
+            assert not checkpointer.is_alive()
+
+    db = get_db(path)
+    assert [get_counter(db, f"Habit {profile}") for profile in ("strict", "normal", "relaxed")] == [1, 1, 1]
+    with pytest.raises(ValueError):
+        get_db(path, "fast")
+    db.close()
+
+
+def test_backup_and_restore(tmp_path):
+    """
+    Test that a backup copies a snapshot without blocking writers, and that only a backup matching its checksum is restored.
+    """
+    path, backup_path = str(tmp_path / "habits.db"), str(tmp_path / "backup.db")
+    db = get_db(path)
+    preload_example_data(db)
+    before = check_ins_by_habit(db)
+    writer = HabitStore(get_db(path))
+    steps = []
+
+    def progress(status, remaining, total):
+        # Another connection checks in between the steps of the backup
+        steps.append(remaining)
+        writer.check_in("Reading")
+
+    checksum = backup(db, backup_path, pages=1, progress=progress)
+    assert len(steps) > 1 and steps[-1] == 0
+    assert get_counter(db, "Reading") == 12 + len(steps)
+    assert open(backup_path + ".sha256").read().split() == [checksum, "backup.db"]
+
+    # The restored database is the snapshot from the start of the backup, and open connections see it
+    assert restore(backup_path, path) == checksum
+    assert check_ins_by_habit(db) == before
+
+    # A damaged backup is rejected before the database is touched
+    writer.check_in("Reading")
+    with open(backup_path, "r+b") as file:
+        file.seek(-100, 2)
+        file.write(b"damaged")
+    with pytest.raises(ValueError):
+        restore(backup_path, path)
+    assert get_counter(db, "Reading") == 13
+    writer.db.close()
+    db.close()
+
+
+def test_restore_then_sync(tmp_path):
+    """
+    Test that a restored database exchanges everything with its sync peers, both the check-ins made
+    since the restore and the ones the backup had missed.
+    """
+    phone, laptop = get_db(str(tmp_path / "phone.db")), get_db(str(tmp_path / "laptop.db"))
+    preload_example_data(phone)
+    sync.sync(phone, laptop)
+    backup(phone, str(tmp_path / "backup.db"))
+    for day in range(1, 4):
+        HabitStore(phone).check_in("Reading", datetime(2024, 12, day, 8, 0, 0))
+    sync.sync(phone, laptop)
+    old_device, last_seq = sync.device_id(phone), last_change_seq(phone)
+
+    restore(str(tmp_path / "backup.db"), str(tmp_path / "phone.db"))
+    assert sync.device_id(phone) != old_device
+    HabitStore(phone).check_in("Cleaning", datetime(2024, 12, 5, 8, 0, 0))
+    # Sequence numbers are never handed out twice
+    assert last_change_seq(phone) > last_seq
+    sync.sync(phone, laptop)
+    assert get_counter(phone, "Cleaning") == get_counter(laptop, "Cleaning") == 5
+    assert get_counter(phone, "Reading") == get_counter(laptop, "Reading") == 15
+    assert check_ins_by_habit(phone) == check_ins_by_habit(laptop)
+    phone.close()
+    laptop.close()
+
+
+def test_schedules_are_validated_on_save():
+    """
+    Test that schedules are stored in their canonical form and that unknown ones are rejected.
+    """
+    assert compile_schedule("3x per week").text == "3 per week"
+    assert compile_schedule("Every 1 day").text == "daily"
+    assert compile_schedule("monthly").text == "monthly on the 1st"
+    assert compile_schedule("monthly on the 22").text == "monthly on the 22nd"
+    assert compile_schedule("weekly") is compile_schedule("weekly")
+    for text in ("fortnightly", "8 per week", "every 0 days", "monthly on the 32nd", None):
+        with pytest.raises(ValueError):
+            compile_schedule(text)
+
+    db = setup_test_database()
+    habit = Habit(name="Gym", description="Lift weights", periodicity="3 Times Per Week")
+    habit.save_to_db(db)
+    assert Habit.get_by_name(db, "Gym").periodicity == "3 per week"
+    with pytest.raises(ValueError):
+        Habit(name="Bad", description="", periodicity="sometimes").save_to_db(db)
+    with pytest.raises(ValueError):
+        HabitStore(db).add_habit("Bad", "", "sometimes")
+    assert "Bad" not in get_habits_list(db)
+    db.close()
+
+
+def test_flexible_schedule_streaks():
+    """
+    Test streaks and completion rates of N-per-week, every-K-days and monthly habits.
+    """
+    db = setup_test_database()
+    store = HabitStore(db)
+    check_ins = {
+        # Weeks starting 04/11 and 11/11 have three check-ins, the week of 18/11 only two
+        "Gym": ("3 per week", ["04/11", "06/11", "08/11", "11/11", "12/11", "17/11", "18/11", "20/11"]),
+        # Periods run 02/11-03/11, 04/11-05/11, 06/11-07/11, ..., so 06/11-07/11 is missed
+        "Water the plants": ("every 2 days", ["02/11", "03/11", "05/11", "08/11"]),
+        # The period of a bill due on the 15th runs from the 15th to the 14th of the next month
+        "Pay rent": ("monthly on the 15th", ["20/10", "16/11", "14/12"]),
+    }
+    for name, (periodicity, days) in check_ins.items():
+        store.add_habit(name, "", periodicity)
+        for day in days:
+            store.check_in(name, datetime.strptime(f"{day}/2024 09:00:00", "%d/%m/%Y %H:%M:%S"))
+
+    assert get_longest_streak(db, "Gym") == 14
+    assert get_longest_streak(db, "Water the plants") == 4
+    assert get_longest_streak(db, "Pay rent") == (datetime(2024, 12, 15) - datetime(2024, 10, 15)).days
+
+    dashboard = {entry["name"]: entry for entry in get_dashboard(db, datetime(2025, 1, 2).date())}
+    assert dashboard["Pay rent"]["current_streak"] == 61
+    assert dashboard["Gym"]["current_streak"] == 0
+    assert dashboard["Water the plants"]["current_streak"] == 0
+    dashboard = {entry["name"]: entry for entry in get_dashboard(db, datetime(2024, 11, 21).date())}
+    assert dashboard["Gym"]["current_streak"] == 14
+    assert dashboard["Gym"]["completion_rate"] == 2 / 3
+    db.close()
+
+
 if __name__ == '__main__':
     test_habit_creation()
     test_habit_incrementation()
@@ -279,4 +1091,21 @@ if __name__ == '__main__':
     test_get_counter()
     test_get_longest_streak()
     test_get_longest_streak_all_habits()
+    test_profiling_disabled_records_nothing()
+    test_profiling_records_calls_and_statements()
+    test_habit_store_check_in_and_reset()
+    test_habit_store_add_and_delete()
+    test_habit_index_prefix_and_pagination()
+    test_habit_index_fuzzy_and_updates()
+    test_menu_names_in_one_query()
+    test_get_dashboard()
+    test_memory_backend_matches_sqlite()
+    test_change_log_records_every_write()
+    test_change_log_retention()
+    test_risk_scores_and_cache()
+    test_risk_engine_follows_writes()
+    test_check_ins_are_counted_in_the_user_timezone()
+    test_activity_report_follows_writes()
+    test_schedules_are_validated_on_save()
+    test_flexible_schedule_streaks()
     print('All tests passed!')
@@ -0,0 +1,42 @@
+import sqlite3
+import pytest
+import queries
+from benchmark import seed_database, query_plan, sample_parameters, time_query
+
+
+@pytest.fixture(scope="module")
+def large_db():
+    """
+    A database seeded with enough habits and check-ins for the query planner to prefer indexes over scans.
+    """
+    db = seed_database(sqlite3.connect(':memory:'), habits=2000, checkins=50)
+    yield db
+    db.close()
+
+
+def test_hot_path_queries_are_registered():
+    """
+    Test that every hot-path query name exists in the registry and has sample parameters.
+    """
+    for name in queries.HOT_PATH:
+        assert name in queries.QUERIES
+        assert queries.QUERIES[name].count("?") == len(sample_parameters(name))
+
+
+@pytest.mark.parametrize("name", queries.HOT_PATH)
+def test_hot_path_query_uses_index(large_db, name):
+    """
+    Test that no hot-path query scans a whole table or sorts its result in a temporary b-tree.
+    """
+    plan = query_plan(large_db, name)
+    for detail in plan:
+        assert not detail.startswith("SCAN"), f"{name} scans a table: {plan}"
+        assert "TEMP B-TREE" not in detail, f"{name} sorts without an index: {plan}"
+
+
+@pytest.mark.parametrize("name", sorted(queries.QUERIES))
+def test_query_runs_at_scale(large_db, name):
+    """
+    Test that every registered query runs against the large database.
+    """
+    assert time_query(large_db, name, repeat=1) >= 0
@@ -0,0 +1,225 @@
+import os
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import repeat
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Years covered by the precomputed UTC offset tables. Timestamps outside fall back to zoneinfo.
+TRANSITION_YEARS = (1970, 2100)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAY_SECONDS = 86400
+
+DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+
+def system_timezone():
+    """
+    Return the IANA name of the timezone this machine is set to, or "UTC" if it cannot be told.
+    """
+    name = os.environ.get("TZ", "").lstrip(":")
+    if not name:
+        try:
+            name = os.path.realpath("/etc/localtime").split("/zoneinfo/", 1)[1]
+        except IndexError:
+            name = "UTC"
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return "UTC"
+    return name
+
+
+def _transitions(zone, first_year, last_year):
+    """
+    Return the UTC timestamps at which the UTC offset of a zone changes, and the offset from each of them on.
+    The offset is sampled once a day and every change is narrowed down to the second by bisection.
+    """
+    def offset(ts):
+        return int(datetime.fromtimestamp(ts, zone).utcoffset().total_seconds())
+
+    low = int(datetime(first_year, 1, 1, tzinfo=timezone.utc).timestamp())
+    high = int(datetime(last_year + 1, 1, 1, tzinfo=timezone.utc).timestamp())
+    starts, offsets = [low], [offset(low)]
+    for ts in range(low + DAY_SECONDS, high + DAY_SECONDS, DAY_SECONDS):
+        current = offset(ts)
+        if current != offsets[-1]:
+            before, after = ts - DAY_SECONDS, ts
+            while after - before > 1:
+                middle = (before + after) // 2
+                if offset(middle) == offsets[-1]:
+                    before = middle
+                else:
+                    after = middle
+            starts.append(after)
+            offsets.append(current)
+    return starts, offsets, high
+
+
+class LocalCalendar:
+    """
+        Converts UTC epoch timestamps to local days and times in one timezone.
+
+        The UTC offsets of the zone are precomputed as a table of transitions, so
+        bucketing a timestamp is a binary search and some integer arithmetic
+        instead of a zoneinfo conversion per row.
+
+        Attributes:
+            name (str): The IANA name of the timezone.
+            zone (tzinfo): The timezone, a ZoneInfo or `timezone.utc`.
+        """
+
+    def __init__(self, name):
+        """
+               Initialize a LocalCalendar instance.
+
+               Parameters:
+                   name (str): The IANA name of the timezone, e.g. "Europe/Budapest".
+
+               Raises:
+                   ValueError: If the timezone is unknown.
+               """
+        try:
+            self.zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            # Without a time zone database, as on Windows without tzdata, UTC is still known
+            if name != "UTC":
+                raise ValueError(f"Unknown timezone '{name}'.")
+            self.zone = timezone.utc
+        self.name = name
+        self._starts, self._offsets, self._high = _transitions(self.zone, *TRANSITION_YEARS)
+        self._low = self._starts[0]
+
+    def __repr__(self):
+        return f"LocalCalendar({self.name!r})"
+
+    def offset(self, ts):
+        """
+                Return the UTC offset in seconds at a timestamp.
+                """
+        if self._low <= ts < self._high:
+            return self._offsets[bisect_right(self._starts, ts) - 1]
+        return int(datetime.fromtimestamp(ts, self.zone).utcoffset().total_seconds())
+
+    def day(self, ts):
+        """
+                Return the ordinal of the local day of a timestamp.
+                """
+        return (ts + self.offset(ts)) // DAY_SECONDS + EPOCH_ORDINAL
+
+    def days(self, timestamps):
+        """
+                Return the ordinals of the local days of many timestamps.
+
+                Parameters:
+                    timestamps (Iterable[int]): UTC epoch timestamps.
+
+                Returns:
+                    List[int]: The local day ordinals, in the same order.
+                """
+        return self.check_in_days(zip(repeat(None), timestamps))
+
+    def minute(self, ts):
+        """
+                Return the local minute of the day of a timestamp.
+                """
+        return (ts + self.offset(ts)) % DAY_SECONDS // 60
+
+    def day_and_minute(self, ts):
+        """
+                Return the ordinal of the local day and the local minute of the day of a timestamp.
+                """
+        days, seconds = divmod(ts + self.offset(ts), DAY_SECONDS)
+        return days + EPOCH_ORDINAL, seconds // 60
+
+    def local_datetime(self, ts):
+        """
+                Return the local time of a timestamp as a naive datetime.
+                """
+        return datetime(1970, 1, 1) + timedelta(seconds=ts + self.offset(ts))
+
+    def format(self, ts):
+        """
+                Return the local time of a timestamp as a "dd/mm/YYYY HH:MM:SS" string.
+                """
+        return self.local_datetime(ts).strftime(DATE_FORMAT)
+
+    def timestamp(self, moment=None):
+        """
+                Return the UTC epoch timestamp of a moment.
+
+                Parameters:
+                    moment (datetime, optional): An aware datetime, or a naive one in local time.
+                                                 Defaults to now.
+
+                Returns:
+                    int: The timestamp.
+                """
+        if moment is None:
+            return int(time.time())
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=self.zone)
+        return int(moment.timestamp())
+
+    def parse(self, increment_date):
+        """
+                Return the timestamp of a "dd/mm/YYYY HH:MM:SS" string in local time.
+                """
+        return self.timestamp(datetime.strptime(increment_date, DATE_FORMAT))
+
+    def check_in_days(self, check_ins):
+        """
+                Return the local day ordinals of check-ins stored as (increment_date, increment_ts) pairs.
+                Check-ins without a timestamp, written by older versions or directly with SQL, hold
+                their local time in the date string, which is used as it is.
+
+                Parameters:
+                    check_ins (Iterable[Tuple[str, Optional[int]]]): The stored check-ins.
+
+                Returns:
+                    List[int]: The local day ordinals, in the same order.
+                """
+        starts, offsets = self._starts, self._offsets
+        ends = starts[1:] + [self._high]
+        # Check-ins mostly arrive in time order, so the offset found for one is kept while the next
+        # ones fall between the same two transitions
+        low = high = shift = 0
+        days = []
+        append = days.append
+        for text, ts in check_ins:
+            if ts is None:
+                append(date(int(text[6:10]), int(text[3:5]), int(text[:2])).toordinal())
+                continue
+            if not low <= ts < high:
+                if not self._low <= ts < self._high:
+                    append(self.day(ts))
+                    continue
+                index = bisect_right(starts, ts) - 1
+                low, high, shift = starts[index], ends[index], offsets[index] + EPOCH_ORDINAL * DAY_SECONDS
+            append((ts + shift) // DAY_SECONDS)
+        return days
+
+
+@lru_cache(maxsize=64)
+def calendar_for(name):
+    """
+    Return the LocalCalendar of a timezone. Calendars are cached, so each transition table is built once.
+
+    Parameters:
+    ----------
+    name : str
+        The IANA name of the timezone.
+
+    Returns:
+    -------
+    LocalCalendar
+        The calendar.
+
+    Raises:
+    ------
+    ValueError
+        If the timezone is unknown.
+    """
+    return LocalCalendar(name)